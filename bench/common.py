@@ -0,0 +1,78 @@
+import json
+import math
+import platform
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, check=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    requests: int
+    errors: int
+    duration_sec: float
+    throughput_rps: float
+    latency_ms: dict[str, float]
+    params: dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_latencies(
+        cls, name: str, latencies: list[float], errors: int, duration_sec: float, **params
+    ):
+        latencies = sorted(latency * 1000 for latency in latencies)
+        return cls(
+            name=name,
+            requests=len(latencies),
+            errors=errors,
+            duration_sec=round(duration_sec, 4),
+            throughput_rps=round(len(latencies) / duration_sec, 2) if duration_sec else 0.0,
+            latency_ms={
+                "min": round(latencies[0], 3) if latencies else 0.0,
+                "p50": round(percentile(latencies, 50), 3),
+                "p95": round(percentile(latencies, 95), 3),
+                "p99": round(percentile(latencies, 99), 3),
+                "max": round(latencies[-1], 3) if latencies else 0.0,
+            },
+            params=params,
+        )
+
+
+def build_report(kind: str, results: list[Any], **settings) -> dict[str, Any]:
+    return {
+        "kind": kind,
+        "commit": git_commit(),
+        "timestamp": int(time.time()),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "settings": settings,
+        "results": [asdict(result) for result in results],
+    }
+
+
+def write_report(report: dict[str, Any], output: str | None):
+    data = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as file:
+            file.write(data + "\n")
+    else:
+        print(data)
@@ -0,0 +1,60 @@
+"""
+Compares two benchmark reports produced by `bench.load` or `bench.micro`.
+
+    python -m bench.compare baseline.json candidate.json --threshold 10
+
+Exits with code 1 if any metric regressed by more than `--threshold` percent.
+"""
+import argparse
+import json
+import sys
+from typing import Any
+
+HIGHER_IS_BETTER = {"throughput_rps", "ops_per_sec"}
+IGNORED = {"requests", "errors", "duration_sec", "size", "repeat"}
+
+
+def flatten_metrics(result: dict[str, Any]) -> dict[str, float]:
+    metrics = {}
+    for key, value in result.items():
+        if key in IGNORED or key == "params":
+            continue
+        if isinstance(value, dict):
+            metrics.update({f"{key}.{k}": v for k, v in value.items() if isinstance(v, (int, float))})
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[key] = value
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two evade84-node benchmark reports")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed regression, percent")
+    args = parser.parse_args()
+
+    with open(args.baseline) as file:
+        baseline = {result["name"]: result for result in json.load(file)["results"]}
+    with open(args.candidate) as file:
+        candidate = {result["name"]: result for result in json.load(file)["results"]}
+
+    regressions = 0
+    print(f"{'benchmark':<40} {'metric':<24} {'baseline':>14} {'candidate':>14} {'change':>9}")
+    for name in baseline.keys() & candidate.keys():
+        before, after = flatten_metrics(baseline[name]), flatten_metrics(candidate[name])
+        for metric in sorted(before.keys() & after.keys()):
+            if not before[metric]:
+                continue
+            change = (after[metric] - before[metric]) / before[metric] * 100
+            worse = -change if metric.split(".")[0] in HIGHER_IS_BETTER else change
+            flag = " !" if worse > args.threshold else ""
+            regressions += bool(flag)
+            print(
+                f"{name:<40} {metric:<24} {before[metric]:>14.3f} {after[metric]:>14.3f} "
+                f"{change:>+8.1f}%{flag}"
+            )
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+End-to-end load benchmark of the node API.
+
+By default the app is booted in-process (ASGI transport, no network) against a local `mongod`
+using a throwaway database, or against a temporary SQLite file with `--storage sqlite`.
+Pass `--url` to load an already running node instead.
+
+    python -m bench.load --output before.json
+    python -m bench.load --scenario chat_write --scenario channel_read --requests 2000
+    python -m bench.compare before.json after.json
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from typing import Awaitable, Callable
+
+import httpx
+
+from bench.common import ScenarioResult, build_report, write_report
+
+WRITER_KEY = "bench-writer-key"
+READER_KEY = "bench-reader-key"
+MASTER_KEY = "bench-master-key"
+SIGNATURE_KEY = "bench-signature-key"
+
+
+async def run_load(
+    name: str,
+    make_request: Callable[[int], Awaitable[httpx.Response]],
+    total: int,
+    concurrency: int,
+    **params,
+) -> ScenarioResult:
+    latencies: list[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started_at = time.perf_counter()
+            response = await make_request(i)
+            latencies.append(time.perf_counter() - started_at)
+            if response.status_code >= 400:
+                errors += 1
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return ScenarioResult.from_latencies(
+        name, latencies, errors, time.perf_counter() - started_at, concurrency=concurrency, **params
+    )
+
+
+async def create_pool(client: httpx.AsyncClient, pool_type: str, **fields) -> str:
+    response = await client.post(
+        "/pool/create", params={"pool_type": pool_type}, json={"master_key": MASTER_KEY, **fields}
+    )
+    response.raise_for_status()
+    return response.json()["address"]
+
+
+async def seed_messages(client: httpx.AsyncClient, address: str, count: int, **params):
+    # sequentially: concurrent writes to the same pool are not what is measured here
+    for i in range(count):
+        response = await client.post(
+            f"/pool/{address}/write",
+            params={"message_type": "plaintext", **params},
+            json={"plaintext": f"history message #{i} " + "x" * random.randint(16, 256)},
+        )
+        response.raise_for_status()
+
+
+async def scenario_chat_write(client: httpx.AsyncClient, args) -> ScenarioResult:
+    """Many writers posting short messages to a few private chats."""
+    addresses = [
+        await create_pool(client, "chat", writer_key=WRITER_KEY, reader_key=READER_KEY)
+        for _ in range(args.pools)
+    ]
+
+    def make_request(i: int):
+        return client.post(
+            f"/pool/{addresses[i % len(addresses)]}/write",
+            params={"message_type": "plaintext", "writer_key": WRITER_KEY},
+            json={"plaintext": f"chat message #{i}"},
+        )
+
+    return await run_load("chat_write", make_request, args.requests, args.concurrency, pools=args.pools)
+
+
+async def scenario_channel_read(client: httpx.AsyncClient, args) -> ScenarioResult:
+    """Readers polling the tail of a public channel with a large history."""
+    address = await create_pool(client, "channel", writer_key=WRITER_KEY, public=True)
+    await seed_messages(client, address, args.history, writer_key=WRITER_KEY)
+
+    def make_request(_: int):
+        return client.get(f"/pool/{address}/read", params={"last": args.page})
+
+    return await run_load(
+        "channel_read",
+        make_request,
+        args.requests,
+        args.concurrency,
+        history=args.history,
+        page=args.page,
+    )
+
+
+async def scenario_pool_list(client: httpx.AsyncClient, args) -> ScenarioResult:
+    """Anonymous clients browsing the public pool directory."""
+    for i in range(args.public_pools):
+        await create_pool(client, "wall", public=True, description=f"public wall #{i}")
+
+    def make_request(_: int):
+        offset = random.randrange(0, max(1, args.public_pools - args.page))
+        return client.get("/pool/list", params={"limit": args.page, "offset": offset})
+
+    return await run_load(
+        "pool_list",
+        make_request,
+        args.requests,
+        args.concurrency,
+        public_pools=args.public_pools,
+        page=args.page,
+    )
+
+
+async def scenario_signed_write(client: httpx.AsyncClient, args) -> ScenarioResult:
+    """Writes to a public wall authenticated with a signature (argon2 verification on each write)."""
+    response = await client.post(
+        "/signature/create", json={"value": "bench", "description": None, "key": SIGNATURE_KEY}
+    )
+    response.raise_for_status()
+    signature = {"uuid": response.json()["uuid"], "key": SIGNATURE_KEY}
+    address = await create_pool(client, "wall", public=True)
+
+    def make_request(i: int):
+        return client.post(
+            f"/pool/{address}/write",
+            params={"message_type": "plaintext"},
+            json={"plaintext": f"signed message #{i}", "signature": signature},
+        )
+
+    return await run_load("signed_write", make_request, args.requests, args.concurrency)
+
+
+SCENARIOS = {
+    "chat_write": scenario_chat_write,
+    "channel_read": scenario_channel_read,
+    "pool_list": scenario_pool_list,
+    "signed_write": scenario_signed_write,
+}
+
+
+async def run_in_process(args) -> list[ScenarioResult]:
+    os.environ.setdefault("NODE_NAME", "bench")
+    os.environ.setdefault("NODE_DESCRIPTION", "benchmark node")
+    os.environ["STORAGE_BACKEND"] = args.storage
+    os.environ["MONGO_HOST"] = args.mongo_host
+    os.environ["MONGO_PORT"] = str(args.mongo_port)
+    os.environ["MONGO_DB"] = f"evade84-bench-{int(time.time())}"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    directory = tempfile.TemporaryDirectory(prefix="evade84-bench-")
+    os.environ["SQLITE_PATH"] = os.path.join(directory.name, "node.sqlite3")
+
+    from node.main import app
+    from node.storage import storage
+
+    await app.router.startup()
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://bench"
+        ) as client:
+            return [await SCENARIOS[name](client, args) for name in args.scenario]
+    finally:
+        if args.storage == "mongo":
+            await storage.client.drop_database(os.environ["MONGO_DB"])
+        await app.router.shutdown()
+        directory.cleanup()
+
+
+async def run_remote(args) -> list[ScenarioResult]:
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        return [await SCENARIOS[name](client, args) for name in args.scenario]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="evade84-node load benchmark")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS.keys())
+    parser.add_argument("--url", help="URL of a running node (default: boot the app in-process)")
+    parser.add_argument("--storage", choices=["mongo", "sqlite"], default="mongo")
+    parser.add_argument("--mongo-host", default="localhost")
+    parser.add_argument("--mongo-port", type=int, default=27017)
+    parser.add_argument("--requests", type=int, default=1000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--pools", type=int, default=8, help="chats used by chat_write")
+    parser.add_argument("--history", type=int, default=500, help="messages seeded for channel_read")
+    parser.add_argument("--public-pools", type=int, default=200, help="pools seeded for pool_list")
+    parser.add_argument("--page", type=int, default=50, help="page size for reads and listing")
+    parser.add_argument("--seed", type=int, default=84)
+    parser.add_argument("--output", help="write JSON report to file instead of stdout")
+    args = parser.parse_args()
+    args.scenario = args.scenario or list(SCENARIOS)
+    return args
+
+
+def main():
+    args = parse_args()
+    random.seed(args.seed)
+    results = asyncio.run(run_remote(args) if args.url else run_in_process(args))
+    settings = {key: value for key, value in vars(args).items() if key != "output"}
+    write_report(build_report("load", results, **settings), args.output)
+
+
+if __name__ == "__main__":
+    main()
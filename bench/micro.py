@@ -0,0 +1,220 @@
+"""
+Micro-benchmarks of the pydantic model layer: time and memory per object.
+
+    python -m bench.micro --output micro.json
+    python -m bench.micro --sizes 10000 100000 1000000 --repeat 3
+
+Pool validation is measured with `pydantic.validate_model`, so no database connection is needed.
+"""
+import argparse
+import gc
+import os
+import statistics
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable
+
+from bench.common import build_report, write_report
+
+os.environ.setdefault("NODE_NAME", "bench")
+os.environ.setdefault("NODE_DESCRIPTION", "benchmark node")
+os.environ.setdefault("MONGO_HOST", "localhost")
+os.environ.setdefault("MONGO_PORT", "27017")
+os.environ.setdefault("MONGO_DB", "evade84-bench")
+
+from pydantic import validate_model  # noqa: E402
+
+from node.enums import MessageType, PoolType  # noqa: E402
+from node.models import database, request, response  # noqa: E402
+
+
+@dataclass
+class MicroResult:
+    name: str
+    size: int
+    repeat: int
+    per_call_ms: float
+    per_object_us: float
+    ops_per_sec: float
+    peak_memory_bytes: int
+    retained_bytes_per_object: float
+
+
+def measure(name: str, func: Callable[[], Any], size: int, repeat: int) -> MicroResult:
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started_at = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started_at)
+    per_call = statistics.median(timings)
+
+    # memory is measured in a separate run: tracemalloc distorts timings
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = func()  # noqa: F841 - kept alive to measure retained memory
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return MicroResult(
+        name=name,
+        size=size,
+        repeat=repeat,
+        per_call_ms=round(per_call * 1000, 4),
+        per_object_us=round(per_call / size * 1_000_000, 4),
+        ops_per_sec=round(size / per_call, 2) if per_call else 0.0,
+        peak_memory_bytes=peak - before,
+        retained_bytes_per_object=round((retained - before) / size, 2),
+    )
+
+
+def raw_signature() -> dict[str, Any]:
+    return {
+        "uuid": "Dji5y",
+        "key_hash": "$argon2id$v=19$m=65536,t=3,p=4$" + "x" * 64,
+        "description": "benchmark signature",
+        "value": "bench",
+        "created_at": datetime.now(),
+    }
+
+
+def raw_messages(count: int, message_type: MessageType) -> list[dict[str, Any]]:
+    now = datetime.now()
+    if message_type == MessageType.plaintext:
+        return [
+            {
+                "type": "plaintext",
+                "id": i,
+                "date": now,
+                "signature": None,
+                "plaintext": f"message #{i} " * 4,
+            }
+            for i in range(1, count + 1)
+        ]
+    return [
+        {
+            "type": "encrypted",
+            "id": i,
+            "date": now,
+            "signature": None,
+            "AES_ciphertext": b"c" * 64,
+            "AES_nonce": b"n" * 16,
+            "AES_tag": b"t" * 16,
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def raw_pool(messages: list[dict[str, Any]], encrypted: bool) -> dict[str, Any]:
+    return {
+        "type": PoolType.chat,
+        "tag": "bench",
+        "description": "benchmark pool",
+        "public": False,
+        "creator_signature": None,
+        "created_at": datetime.now(),
+        "master_key_hash": "master",
+        "writer_key_hash": "writer",
+        "reader_key_hash": "reader",
+        "encrypted": encrypted,
+        "messages": messages,
+    }
+
+
+def validate_pool(data: dict[str, Any]) -> dict[str, Any]:
+    values, _, error = validate_model(database.Pool, data)
+    if error:
+        raise error
+    return values
+
+
+def bench_pool(size: int, repeat: int, message_type: MessageType) -> list[MicroResult]:
+    data = raw_pool(raw_messages(size, message_type), encrypted=message_type == MessageType.encrypted)
+    values = validate_pool(data)
+    messages = values["messages"]
+    return [
+        measure(f"pool_validation[{message_type.value}]", lambda: validate_pool(data), size, repeat),
+        measure(
+            f"response_messages[{message_type.value}]",
+            lambda: response.ResponseMessages(
+                total=size,
+                count=size,
+                encrypted=data["encrypted"],
+                has_more=False,
+                messages=messages,
+            ),
+            size,
+            repeat,
+        ),
+    ]
+
+
+def bench_single_objects(iterations: int, repeat: int) -> list[MicroResult]:
+    signature = database.Signature.construct(**raw_signature())
+    pool_values = validate_pool(raw_pool([], encrypted=False))
+    pool = database.Pool.construct(**{**pool_values, "creator_signature": signature})
+    plaintext = request.RequestNewMessage(plaintext="Hi everyone here!")
+    encrypted = request.RequestNewMessage(
+        AES_ciphertext=b"c" * 64, AES_nonce=b"n" * 16, AES_tag=b"t" * 16
+    )
+    new_pool = request.RequestNewPool(
+        master_key="master-key", writer_key="writer-key", reader_key="reader-key"
+    )
+
+    def loop(func: Callable[[], Any]) -> Callable[[], list[Any]]:
+        return lambda: [func() for _ in range(iterations)]
+
+    return [
+        measure(
+            "response_pool_from_db_model",
+            loop(lambda: response.ResponsePool.from_db_model(pool)),
+            iterations,
+            repeat,
+        ),
+        measure(
+            "request_new_message_validate_based_on_type[plaintext]",
+            loop(lambda: plaintext.validate_based_on_type(MessageType.plaintext)),
+            iterations,
+            repeat,
+        ),
+        measure(
+            "request_new_message_validate_based_on_type[encrypted]",
+            loop(lambda: encrypted.validate_based_on_type(MessageType.encrypted)),
+            iterations,
+            repeat,
+        ),
+        measure(
+            "request_new_pool_validate_based_on_type",
+            loop(lambda: new_pool.validate_based_on_type(PoolType.chat)),
+            iterations,
+            repeat,
+        ),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="evade84-node model micro-benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument(
+        "--iterations", type=int, default=10_000, help="calls for single-object benchmarks"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write JSON report to file instead of stdout")
+    args = parser.parse_args()
+
+    results = bench_single_objects(args.iterations, args.repeat)
+    for size in args.sizes:
+        for message_type in MessageType:
+            for result in bench_pool(size, args.repeat, message_type):
+                result.name = f"{result.name}[{size}]"
+                results.append(result)
+
+    settings = {key: value for key, value in vars(args).items() if key != "output"}
+    write_report(build_report("micro", results, **settings), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import asyncio
+
+from node.config import config
+from node.directory import directory
+from node.models import database
+from node.storage import storage
+from node.storage.base import NewMessage
+
+
+class _PoolQueue:
+    __slots__ = ("pool", "pending", "full", "task")
+
+    def __init__(self, pool: database.Pool):
+        self.pool = pool
+        self.pending: list[tuple[NewMessage, asyncio.Future]] = []
+        self.full = asyncio.Event()
+        self.task: asyncio.Task | None = None
+
+
+class WriteCoalescer:
+    """
+    Group commit of pool messages.
+
+    Messages written to the same pool are queued and persisted by a single task per pool, in batches of
+    up to `WRITE_BATCH_SIZE` messages: one storage operation per batch instead of one per message.
+    The batch is flushed after `WRITE_BATCH_WINDOW_MS` or as soon as it is full; messages arriving while
+    a batch is being persisted go to the next one, so batching happens even with zero window.
+    """
+
+    def __init__(self):
+        self._queues: dict[str, _PoolQueue] = {}
+
+    async def write(
+        self, pool: database.Pool, message: NewMessage
+    ) -> database.PlaintextMessage | database.EncryptedMessage:
+        queue = self._queues.get(pool.address)
+        if queue is None:
+            queue = self._queues[pool.address] = _PoolQueue(pool)
+        future = asyncio.get_running_loop().create_future()
+        queue.pending.append((message, future))
+        if queue.task is None:
+            queue.task = asyncio.create_task(self._flush_queue(pool.address, queue))
+        elif len(queue.pending) >= config.WRITE_BATCH_SIZE:
+            queue.full.set()
+        return await future
+
+    async def _flush_queue(self, address: str, queue: _PoolQueue):
+        try:
+            while queue.pending:
+                if config.WRITE_BATCH_WINDOW_MS and len(queue.pending) < config.WRITE_BATCH_SIZE:
+                    queue.full.clear()
+                    try:
+                        await asyncio.wait_for(queue.full.wait(), config.WRITE_BATCH_WINDOW_MS / 1000)
+                    except asyncio.TimeoutError:
+                        pass
+                batch = queue.pending[: config.WRITE_BATCH_SIZE]
+                del queue.pending[: config.WRITE_BATCH_SIZE]
+                await self._flush_batch(queue.pool, batch)
+        finally:
+            # no awaits between the empty queue check and removal: no message is left behind
+            del self._queues[address]
+            for _, future in queue.pending:  # the task was cancelled
+                future.cancel()
+
+    @staticmethod
+    async def _flush_batch(pool: database.Pool, batch: list[tuple[NewMessage, asyncio.Future]]):
+        try:
+            db_messages = await storage.write_messages(pool, [message for message, _ in batch])
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+        else:
+            directory.update_counters(pool)
+            for (_, future), db_message in zip(batch, db_messages):
+                if not future.done():
+                    future.set_result(db_message)
+
+
+coalescer = WriteCoalescer()
@@ -0,0 +1,216 @@
+import asyncio
+import zlib
+from typing import Callable
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from node.config import config
+
+try:
+    import brotli
+except ImportError:  # optional dependency, see `compression` extra
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional dependency, see `compression` extra
+    zstandard = None
+
+# already compact binary formats (images, archives, encrypted blobs...) are never compressed
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+}
+CACHE_SIZE = 256
+
+
+def is_compressible(content_type: str | None) -> bool:
+    if not content_type:
+        return False
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    if media_type in COMPRESSIBLE_TYPES or media_type.startswith("text/"):
+        return True
+    return media_type.endswith(("+json", "+xml"))
+
+
+class _GzipEncoder:
+    def __init__(self):
+        self._compressor = zlib.compressobj(config.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=config.COMPRESSION_BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+class _ZstdEncoder:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=config.COMPRESSION_ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(
+            zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+ENCODERS: dict[str, Callable[[], _GzipEncoder | _BrotliEncoder | _ZstdEncoder]] = {"gzip": _GzipEncoder}
+if brotli is not None:
+    ENCODERS["br"] = _BrotliEncoder
+if zstandard is not None:
+    ENCODERS["zstd"] = _ZstdEncoder
+
+
+def negotiate(accept_encoding: str | None, encodings: list[str]) -> str | None:
+    """Picks the encoding with the highest `Accept-Encoding` weight, ties are resolved by `encodings` order."""
+    if not accept_encoding:
+        return None
+    weights: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, *params = [part.strip() for part in item.split(";")]
+        weight = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name.lower()] = weight
+    best, best_weight = None, 0.0
+    for encoding in encodings:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+async def _run(func: Callable[[bytes], bytes], data: bytes) -> bytes:
+    # zlib, brotli and zstandard release the GIL, large bodies do not block the event loop
+    if len(data) >= config.COMPRESSION_THREAD_MIN_SIZE:
+        return await asyncio.get_running_loop().run_in_executor(None, func, data)
+    return func(data)
+
+
+class _Responder:
+    """Compresses one response, the start message is held until the first body chunk arrives."""
+
+    def __init__(
+        self, middleware: "CompressionMiddleware", scope: Scope, send: Send, encoding: str | None
+    ):
+        self.middleware = middleware
+        self.scope = scope
+        self.send = send
+        self.encoding = encoding
+        self.start: Message | None = None
+        self.encoder: _GzipEncoder | _BrotliEncoder | _ZstdEncoder | None = None
+
+    async def __call__(self, message: Message):
+        if message["type"] == "http.response.start":
+            self.start = message
+        elif message["type"] != "http.response.body":
+            await self.send(message)
+        elif self.encoder is not None:  # streaming response which is being compressed
+            more_body = message.get("more_body", False)
+            func = self.encoder.compress if more_body else self.encoder.finish
+            chunk = await _run(func, message.get("body", b""))
+            await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+        elif self.start is not None:
+            start, self.start = self.start, None
+            await self._send_first(start, message)
+        else:
+            await self.send(message)
+
+    def _should_compress(
+        self, start: Message, headers: MutableHeaders, body: bytes, more_body: bool
+    ) -> bool:
+        if self.encoding is None or start["status"] < 200 or start["status"] in (204, 304):
+            return False
+        size = int(headers.get("content-length", -1)) if more_body else len(body)
+        return size < 0 or size >= config.COMPRESSION_MIN_SIZE
+
+    async def _send_first(self, start: Message, message: Message):
+        headers = MutableHeaders(raw=start["headers"])
+        body, more_body = message.get("body", b""), message.get("more_body", False)
+        etag = headers.get("etag")
+        if self.encoding and etag and not etag.startswith("W/"):
+            # whether the body is compressed depends on its size, which is unknown for 304 responses:
+            # the tag is weak whenever an encoding is negotiated, so 200 and 304 responses share it
+            headers["ETag"] = f"W/{etag}"
+        if not is_compressible(headers.get("content-type")) or "content-encoding" in headers:
+            await self.send(start)
+            return await self.send(message)
+        headers.add_vary_header("Accept-Encoding")
+        if not self._should_compress(start, headers, body, more_body):
+            await self.send(start)
+            return await self.send(message)
+
+        headers["Content-Encoding"] = self.encoding
+        if more_body:
+            del headers["content-length"]
+            self.encoder = ENCODERS[self.encoding]()
+            await self.send(start)
+            chunk = await _run(self.encoder.compress, body)
+            return await self.send({"type": "http.response.body", "body": chunk, "more_body": True})
+
+        compressed = await self.middleware.compress(self.encoding, self.scope, etag, body)
+        headers["Content-Length"] = str(len(compressed))
+        await self.send(start)
+        await self.send({"type": "http.response.body", "body": compressed})
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with the best encoding accepted by the client (`COMPRESSION_ENCODINGS`).
+
+    Only text formats (JSON, NDJSON, HTML...) of at least `COMPRESSION_MIN_SIZE` bytes are compressed.
+    Streaming responses are compressed chunk by chunk, every chunk is flushed, so clients can decode
+    it as soon as it arrives. Compressed bodies of responses with an entity tag are cached,
+    so a popular page is compressed once per version. Entity tags of responses to clients accepting
+    an encoding become weak (RFC 7232), whether the body is compressed or not.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.encodings = [
+            encoding.strip()
+            for encoding in config.COMPRESSION_ENCODINGS.split(",")
+            if encoding.strip() in ENCODERS
+        ]
+        self._cache: dict[tuple[str, str, bytes, str], bytes] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            return await self.app(scope, receive, send)
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"), self.encodings)
+        await self.app(scope, receive, _Responder(self, scope, send, encoding))
+
+    async def compress(self, encoding: str, scope: Scope, etag: str | None, body: bytes) -> bytes:
+        # the entity tag of `/pool/{identifier}/read` is the same for all pages, so the query is a part of the key
+        key = (encoding, scope["path"], scope["query_string"], etag)
+        compressed = self._cache.get(key) if etag else None
+        if compressed is None:
+            compressed = await _run(ENCODERS[encoding]().finish, body)
+            if etag:
+                if len(self._cache) >= CACHE_SIZE:
+                    self._cache.clear()
+                self._cache[key] = compressed
+        return compressed
@@ -1,15 +1,78 @@
 from betterconf import Config as BaseConfig
 from betterconf import field
-from betterconf.caster import to_int
+from betterconf.caster import to_bool, to_float, to_int
 
 
 class Config(BaseConfig):
     NODE_NAME = field()
     NODE_DESCRIPTION = field()
 
-    MONGO_HOST = field()
-    MONGO_PORT = field(caster=to_int)
-    MONGO_DB = field()
+    STORAGE_BACKEND = field(default="mongo")  # "mongo" or "sqlite"
+
+    MONGO_HOST = field(default="localhost")
+    MONGO_PORT = field(default=27017, caster=to_int)
+    MONGO_DB = field(default="evade84-node")
+    MONGO_REPLICA_SET = field(default=None)
+    MONGO_MAX_POOL_SIZE = field(default=100, caster=to_int)
+    MONGO_MIN_POOL_SIZE = field(default=0, caster=to_int)
+    MONGO_CONNECT_TIMEOUT_MS = field(default=20000, caster=to_int)
+    MONGO_SOCKET_TIMEOUT_MS = field(default=0, caster=to_int)  # 0 means no timeout
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = field(default=30000, caster=to_int)
+    MONGO_WRITE_CONCERN = field(default="majority")  # "majority" or number of acknowledging nodes
+    MONGO_WRITE_TIMEOUT_MS = field(default=10000, caster=to_int)
+    # read preference of read-only routes, other reads always go to the primary:
+    # primary, primaryPreferred, secondary, secondaryPreferred or nearest
+    MONGO_READ_PREFERENCE = field(default="primary")
+    # secondaries lagging behind more are not read from, at least 90 (-1 means no limit)
+    MONGO_MAX_STALENESS_SEC = field(default=90, caster=to_int)
+
+    SQLITE_PATH = field(default="evade84-node.sqlite3")
+
+    EPHEMERAL_POOL_CAPACITY = field(default=1000, caster=to_int)  # messages kept per ephemeral pool
+
+    FANOUT_MODE = field(default="local")  # "local" or "mongo" (change streams, requires replica set)
+    FANOUT_BATCH_SIZE = field(default=100, caster=to_int)
+    FANOUT_BATCH_WINDOW_MS = field(default=50, caster=to_int)
+    POLL_MAX_TIMEOUT_SEC = field(default=60, caster=to_int)
+
+    # public pool directory (`/pool/list`)
+    DIRECTORY_REFRESH_SEC = field(default=30, caster=to_int)  # full rebuild interval
+    DIRECTORY_MAX_AGE_SEC = field(default=10, caster=to_int)  # `Cache-Control: max-age` of the list
+
+    # group commit of messages written to the same pool (see `node.coalescer`)
+    WRITE_BATCH_SIZE = field(default=100, caster=to_int)
+    # 0 batches only writes queued during a flush
+    WRITE_BATCH_WINDOW_MS = field(default=2, caster=to_int)
+
+    # responses are replayed for this time
+    IDEMPOTENCY_TTL_SEC = field(default=24 * 60 * 60, caster=to_int)
+    # key of request fingerprints, must be the same for all workers (random one is generated if not set),
+    # required with `FANOUT_MODE=mongo`
+    IDEMPOTENCY_SECRET = field(default=None)
+
+    STREAM_BATCH_SIZE = field(default=500, caster=to_int)  # messages per batch of export and import
+    IMPORT_MAX_LINE_BYTES = field(default=1024 * 1024, caster=to_int)
+
+    # pull replication of public pools from another node (see `node.replication`)
+    REPLICATION_PEER = field(default=None)  # base URL of the peer, e.g. http://node-a:8080
+    REPLICATION_POOLS = field(default="")  # comma-separated tags or addresses of the pools to follow
+    REPLICATION_BATCH_SIZE = field(default=500, caster=to_int)  # messages per request to the peer
+    REPLICATION_POLL_TIMEOUT_SEC = field(default=30, caster=to_int)  # long polling timeout
+
+    # response compression (see `node.compression`), br and zstd require the `compression` extra
+    COMPRESSION_ENCODINGS = field(default="zstd,br,gzip")  # in order of preference, empty disables
+    COMPRESSION_MIN_SIZE = field(default=1024, caster=to_int)  # smaller bodies are sent as is
+    # larger bodies are compressed in a thread pool
+    COMPRESSION_THREAD_MIN_SIZE = field(default=64 * 1024, caster=to_int)
+    COMPRESSION_GZIP_LEVEL = field(default=5, caster=to_int)
+    COMPRESSION_BROTLI_QUALITY = field(default=4, caster=to_int)
+    COMPRESSION_ZSTD_LEVEL = field(default=3, caster=to_int)
+
+    LOG_LEVEL = field(default="INFO")
+    LOG_JSON = field(default=False, caster=to_bool)
+    LOG_SAMPLE_RATE = field(default=1.0, caster=to_float)  # share of high-volume info logs to keep
+    # share of access lines (one per request) to keep, server errors are always logged
+    LOG_ACCESS_SAMPLE_RATE = field(default=0.1, caster=to_float)
 
 
 config = Config()
@@ -0,0 +1,141 @@
+import asyncio
+import bisect
+import time
+
+from node import ephemeral, etag
+from node.config import config
+from node.enums import PoolSort
+from node.models import database, response
+from node.storage import storage
+
+PAGE_CACHE_SIZE = 256
+
+
+class Directory:
+    """
+    Snapshot of public pools served by `/pool/list`.
+
+    Every pool is kept serialized, so a page is assembled by joining bytes; assembled pages are cached
+    until the next change. Changes made by this process are applied incrementally, changes made by
+    other workers are picked up by a full rebuild every `DIRECTORY_REFRESH_SEC` seconds.
+    Orders by activity are sorted on demand from the counters kept with every pool; writes only update
+    the counters and invalidate the pages which depend on them.
+    """
+
+    def __init__(self):
+        self._keys: list[tuple[str, str]] = []  # (created_at, address), sorted
+        self._pools: dict[str, bytes] = {}  # address -> serialized `ResponsePool`
+        self._activity: dict[str, tuple[str, int]] = {}  # address -> (last_message_at, message_count)
+        self._orders: dict[PoolSort, list[str]] = {}  # sort -> addresses, for orders other than creation
+        self._unsorted: set[PoolSort] = set()  # orders with outdated positions of some pools
+        # (sort, limit, offset) -> (body, etag)
+        self._pages: dict[tuple[PoolSort, int, int], tuple[bytes, str]] = {}
+        self._built_at = 0.0
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _key(pool: database.Pool) -> tuple[str, str]:
+        return pool.created_at.isoformat(), pool.address
+
+    @staticmethod
+    def _serialize(pool: database.Pool) -> bytes:
+        return response.ResponsePool.from_db_model(ephemeral.apply_counters(pool)).json().encode()
+
+    @staticmethod
+    def _activity_of(pool: database.Pool) -> tuple[str, int]:
+        return pool.last_message_at.isoformat() if pool.last_message_at else "", pool.message_count
+
+    async def rebuild(self):
+        pools = await storage.get_public_pools(allow_stale=True)
+        keys = sorted(self._key(pool) for pool in pools)
+        serialized = {pool.address: self._serialize(pool) for pool in pools}
+        activity = {pool.address: self._activity_of(pool) for pool in pools}
+        self._keys, self._pools, self._activity = keys, serialized, activity
+        self._orders, self._pages = {}, {}
+        self._built_at = time.monotonic()
+
+    async def _refresh_if_outdated(self):
+        if time.monotonic() - self._built_at < config.DIRECTORY_REFRESH_SEC:
+            return
+        async with self._lock:
+            if time.monotonic() - self._built_at >= config.DIRECTORY_REFRESH_SEC:
+                await self.rebuild()
+
+    def put(self, pool: database.Pool):
+        """Adds or replaces the pool (if it is public)."""
+        if not pool.public:
+            return
+        if pool.address not in self._pools:
+            bisect.insort(self._keys, self._key(pool))
+        self._pools[pool.address] = self._serialize(pool)
+        self._activity[pool.address] = self._activity_of(pool)
+        self._orders.clear()
+        self._pages.clear()
+
+    def update_counters(self, pool: database.Pool):
+        """Updates activity counters of the listed pool after a write, other fields are kept as listed."""
+        serialized = self._pools.get(pool.address)
+        if serialized is None:  # not public or deleted meanwhile
+            return
+        pool = ephemeral.apply_counters(pool)
+        listed = response.ResponsePool.parse_raw(serialized)
+        if listed.last_message_id > pool.last_message_id:  # a later write is already listed
+            return
+        counters = {
+            "message_count": pool.message_count,
+            "last_message_id": pool.last_message_id,
+            "last_message_at": pool.last_message_at,
+            "stored_bytes": pool.stored_bytes,
+        }
+        self._pools[pool.address] = listed.copy(update=counters).json().encode()
+        self._activity[pool.address] = self._activity_of(pool)
+        self._unsorted.update(self._orders)
+        # pages in the order of creation keep their slices, only the one listing the pool is outdated
+        index = bisect.bisect_left(self._keys, self._key(pool))
+        self._pages = {
+            (sort, limit, offset): page
+            for (sort, limit, offset), page in self._pages.items()
+            if sort == PoolSort.created_at and not offset <= index < offset + limit
+        }
+
+    def remove(self, pool: database.Pool):
+        if self._pools.pop(pool.address, None) is not None:
+            self._keys = [key for key in self._keys if key[1] != pool.address]
+            del self._activity[pool.address]
+            self._orders.clear()
+            self._pages.clear()
+
+    def _slice(self, sort: PoolSort, limit: int, offset: int) -> list[str]:
+        if sort == PoolSort.created_at:
+            return [address for _, address in self._keys[offset : offset + limit]]
+        order = self._orders.get(sort)
+        if order is None:
+            order = self._orders[sort] = list(self._activity)
+            self._unsorted.add(sort)
+        if sort in self._unsorted:
+            # the previous order is nearly sorted (only written pools have moved), so sorting it is fast
+            field = 0 if sort == PoolSort.last_message_at else 1
+            order.sort(key=lambda address: self._activity[address][field], reverse=True)
+            self._unsorted.discard(sort)
+        return order[offset : offset + limit]
+
+    async def get_page(
+        self, limit: int, offset: int, sort: PoolSort = PoolSort.created_at
+    ) -> tuple[bytes, str]:
+        """Returns serialized `ResponsePools` page and its entity tag."""
+        await self._refresh_if_outdated()
+        page = self._pages.get((sort, limit, offset))
+        if page is None:
+            pools = [self._pools[address] for address in self._slice(sort, limit, offset)]
+            body = b'{"total": %d, "count": %d, "pools": [%b]}' % (
+                len(self._keys),
+                len(pools),
+                b", ".join(pools),
+            )
+            if len(self._pages) >= PAGE_CACHE_SIZE:
+                self._pages.clear()
+            page = self._pages[(sort, limit, offset)] = body, etag.build_from_body(body)
+        return page
+
+
+directory = Directory()
@@ -11,3 +11,9 @@ class PoolType(str, Enum):
     channel = "channel"
     chat = "chat"
     mailbox = "mailbox"
+
+
+class PoolSort(str, Enum):
+    created_at = "created_at"  # oldest first
+    last_message_at = "last_message_at"  # recently active first
+    message_count = "message_count"  # largest first
@@ -0,0 +1,138 @@
+from datetime import datetime
+
+from node.config import config
+from node.enums import MessageType
+from node.models import database, request, response
+
+
+class EphemeralMessage:
+    """Compact in-memory message record. Duck-types `database.PlaintextMessage` / `database.EncryptedMessage`."""
+
+    __slots__ = (
+        "type",
+        "id",
+        "date",
+        "signature",
+        "plaintext",
+        "AES_ciphertext",
+        "AES_nonce",
+        "AES_tag",
+    )
+
+    def __init__(
+        self,
+        type: MessageType,  # noqa
+        id: int,  # noqa
+        date: datetime,
+        signature: database.Signature | None,
+        plaintext: str | None = None,
+        AES_ciphertext: bytes | None = None,  # noqa
+        AES_nonce: bytes | None = None,  # noqa
+        AES_tag: bytes | None = None,  # noqa
+    ):
+        self.type = type
+        self.id = id
+        self.date = date
+        self.signature = signature
+        self.plaintext = plaintext
+        self.AES_ciphertext = AES_ciphertext
+        self.AES_nonce = AES_nonce
+        self.AES_tag = AES_tag
+
+    def to_response_model(self) -> response.ResponsePlaintextMessage | response.ResponseEncryptedMessage:
+        match self.type:
+            case MessageType.plaintext:
+                return response.ResponsePlaintextMessage.from_db_model(self)  # noqa
+            case MessageType.encrypted:
+                return response.ResponseEncryptedMessage.from_db_model(self)  # noqa
+            case _:
+                raise ValueError("Invalid message type.")
+
+
+class RingBuffer:
+    """Fixed-capacity buffer of messages: when full, the oldest message is overwritten."""
+
+    __slots__ = ("capacity", "last_id", "last_date", "stored_bytes", "_slots")
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("Ring buffer capacity must be more than 0.")
+        self.capacity = capacity
+        self.last_id = 0
+        self.last_date: datetime | None = None
+        self.stored_bytes = 0  # size of the messages which are currently kept
+        self._slots: list[EphemeralMessage | None] = [None] * capacity
+
+    def __len__(self) -> int:
+        return min(self.last_id, self.capacity)
+
+    def append(self, message: EphemeralMessage):
+        slot = (message.id - 1) % self.capacity
+        if self._slots[slot] is not None:
+            self.stored_bytes -= database.message_size(self._slots[slot])  # noqa
+        self._slots[slot] = message
+        self.stored_bytes += database.message_size(message)  # noqa
+        self.last_id = message.id
+        self.last_date = message.date
+
+    def first(self, count: int, after_id: int = 0) -> list[EphemeralMessage]:
+        first_id = max(self.last_id - len(self), after_id) + 1
+        last_id = min(first_id + count - 1, self.last_id)
+        return [self._slots[(id - 1) % self.capacity] for id in range(first_id, last_id + 1)]
+
+    def last(self, count: int, after_id: int = 0) -> list[EphemeralMessage]:
+        first_id = max(self.last_id - min(count, len(self)), after_id) + 1
+        return [self._slots[(id - 1) % self.capacity] for id in range(first_id, self.last_id + 1)]
+
+
+_buffers: dict[str, RingBuffer] = {}
+
+
+def get_buffer(pool: database.Pool) -> RingBuffer:
+    buffer = _buffers.get(pool.address)
+    if buffer is None:
+        buffer = _buffers[pool.address] = RingBuffer(config.EPHEMERAL_POOL_CAPACITY)
+    return buffer
+
+
+def apply_counters(pool: database.Pool) -> database.Pool:
+    """Sets activity counters of the ephemeral pool from its buffer (persistent pools are not changed)."""
+    if pool.ephemeral:
+        buffer = get_buffer(pool)
+        pool.message_count = len(buffer)
+        pool.last_message_id = buffer.last_id
+        pool.last_message_at = buffer.last_date
+        pool.stored_bytes = buffer.stored_bytes
+    return pool
+
+
+def drop_buffer(pool: database.Pool):
+    _buffers.pop(pool.address, None)
+
+
+def write_message_to_pool(
+    pool: database.Pool,
+    message_type: MessageType,
+    message: request.RequestNewMessage,
+    signature: database.Signature | None,
+) -> EphemeralMessage:
+    buffer = get_buffer(pool)
+    match message_type:
+        case MessageType.plaintext:
+            record = EphemeralMessage(
+                message_type, buffer.last_id + 1, datetime.now(), signature, plaintext=message.plaintext
+            )
+        case MessageType.encrypted:
+            record = EphemeralMessage(
+                message_type,
+                buffer.last_id + 1,
+                datetime.now(),
+                signature,
+                AES_ciphertext=message.AES_ciphertext,
+                AES_nonce=message.AES_nonce,
+                AES_tag=message.AES_tag,
+            )
+        case _:
+            raise ValueError("Invalid message type.")
+    buffer.append(record)
+    return record
@@ -0,0 +1,29 @@
+import hashlib
+import secrets
+
+from fastapi import Response
+
+# versions of resources kept in memory (ephemeral pools) are valid within one process only
+EPOCH = secrets.token_hex(6)
+
+
+def build(*parts) -> str:
+    """Builds strong entity tag from the parts of resource version."""
+    return build_from_body(":".join(map(str, parts)).encode())
+
+
+def build_from_body(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+
+def matches(if_none_match: str | None, etag: str) -> bool:
+    """Checks `If-None-Match` header value against the entity tag (weak comparison, RFC 7232)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
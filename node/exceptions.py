@@ -14,6 +14,20 @@ class ConflictException(APIException):
     error_message = "The request cannot be processed because of conflict."
 
 
+class StaleRevisionException(ConflictException):
+    error_message = (
+        "The item was updated by another request, fetch it and retry with its current revision."
+    )
+
+
+class ReadOnlyReplicaException(ConflictException):
+    error_message = "The pool is a read-only replica, write to the node it is replicated from."
+
+
+class MessageIdConflictException(ConflictException):
+    error_message = "The last message of the pool is not the expected one."
+
+
 class NotFoundException(APIException):
     status_code = 404
     error_message = "Requested item does not exist."
@@ -0,0 +1,172 @@
+import asyncio
+from collections import defaultdict
+from typing import Any
+
+from bson import ObjectId
+from loguru import logger
+from pymongo.errors import OperationFailure, PyMongoError
+
+from node.config import config
+from node.models.database import Pool
+
+RESUME_TOKEN_LOST_CODES = {
+    260,
+    280,
+    286,
+}  # InvalidResumeToken, ChangeStreamFatalError, ChangeStreamHistoryLost
+
+# only writes of messages move `last_message_id` (see `Storage.write_messages`), so creation and metadata
+# updates of pools are skipped; update events carry changed fields only, no lookup of the whole document
+# is needed, addresses of the pools are resolved by `_id` (see `FanOut._resolve`)
+CHANGE_STREAM_PIPELINE = [
+    {
+        "$match": {
+            "operationType": "update",
+            "updateDescription.updatedFields.last_message_id": {"$exists": True},
+        }
+    },
+    {
+        "$project": {
+            "documentKey": 1,
+            "last_message_id": "$updateDescription.updatedFields.last_message_id",
+        }
+    },
+]
+ADDRESS_CACHE_SIZE = 10000
+
+
+class FanOut:
+    """
+    Notifies local waiters about new pool messages.
+
+    In `local` mode only writes handled by this process are dispatched. In `mongo` mode every worker also
+    tails a change stream of the pools collection, so writes handled by other workers or containers are
+    dispatched too (requires a replica set).
+    """
+
+    def __init__(self):
+        self._waiters: dict[str, set[asyncio.Future]] = defaultdict(set)
+        self._resume_token: dict[str, Any] | None = None
+        self._addresses: dict[ObjectId, str] = {}  # pool `_id` -> address, addresses are immutable
+        self._opened = False  # whether the current change stream was opened (see `_watch_forever`)
+        self._task: asyncio.Task | None = None
+
+    def subscribe(self, address: str) -> asyncio.Future:
+        """Returns future resolved with the last message id of the pool on the next write to it."""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[address].add(future)
+        return future
+
+    def unsubscribe(self, address: str, future: asyncio.Future):
+        waiters = self._waiters.get(address)
+        if waiters is not None:
+            waiters.discard(future)
+            if not waiters:
+                del self._waiters[address]
+
+    async def wait(self, future: asyncio.Future, address: str, timeout: float) -> bool:
+        """Waits for the subscribed future, returns `False` on timeout."""
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.unsubscribe(address, future)
+
+    def publish(self, address: str, last_message_id: int | None):
+        for future in self._waiters.pop(address, ()):
+            if not future.done():
+                future.set_result(last_message_id)
+
+    def publish_all(self):
+        for address in list(self._waiters):
+            self.publish(address, None)
+
+    async def start(self):
+        if config.FANOUT_MODE == "mongo":
+            if config.STORAGE_BACKEND != "mongo":
+                raise ValueError("Fan-out mode `mongo` requires `mongo` storage backend.")
+            self._task = asyncio.create_task(self._watch_forever())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        self.publish_all()
+
+    async def _watch_forever(self):
+        delay = 0.5
+        while True:
+            self._opened = False
+            try:
+                await self._watch(Pool.get_motor_collection())
+            except OperationFailure as exc:
+                if exc.code in RESUME_TOKEN_LOST_CODES:
+                    # events were lost: wake everyone up so they re-read the pools
+                    logger.warning(
+                        "Change stream can not be resumed, restarting it: {error}.", error=exc
+                    )
+                    self._resume_token = None
+                    self.publish_all()
+                else:
+                    logger.exception(exc)
+            except PyMongoError as exc:
+                logger.warning("Change stream was interrupted: {error}.", error=exc)
+            if self._opened:  # the stream has worked since the previous failure
+                delay = 0.5
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+    async def _watch(self, collection):
+        loop = asyncio.get_running_loop()
+        async with collection.watch(
+            CHANGE_STREAM_PIPELINE,
+            resume_after=self._resume_token,
+            batch_size=config.FANOUT_BATCH_SIZE,
+            max_await_time_ms=config.FANOUT_BATCH_WINDOW_MS,
+        ) as stream:
+            self._opened = True
+            logger.info("Watching pools change stream.")
+            async for change in stream:
+                # got the first event, drain whatever arrives within the batching window
+                deadline = loop.time() + config.FANOUT_BATCH_WINDOW_MS / 1000
+                pending: dict[ObjectId, int] = {}
+                self._collect(change, pending)
+                events = 1
+                while events < config.FANOUT_BATCH_SIZE and loop.time() < deadline:
+                    change = await stream.try_next()
+                    if change is None:
+                        break
+                    self._collect(change, pending)
+                    events += 1
+                self._resume_token = stream.resume_token
+                addresses = await self._resolve(collection, list(pending))
+                for pool_id, last_message_id in pending.items():
+                    if pool_id in addresses:
+                        self.publish(addresses[pool_id], last_message_id)
+
+    @staticmethod
+    def _collect(change: dict[str, Any], pending: dict[ObjectId, int]):
+        pool_id = change["documentKey"]["_id"]
+        pending[pool_id] = max(pending.get(pool_id, 0), change["last_message_id"])
+
+    def _cache_address(self, pool_id: ObjectId, address: str):
+        if len(self._addresses) >= ADDRESS_CACHE_SIZE:
+            self._addresses.clear()
+        self._addresses[pool_id] = address
+
+    async def _resolve(self, collection, pool_ids: list[ObjectId]) -> dict[ObjectId, str]:
+        """Returns addresses of the pools, the unknown ones are fetched in one query."""
+        addresses = {
+            pool_id: self._addresses[pool_id] for pool_id in pool_ids if pool_id in self._addresses
+        }
+        unknown = [pool_id for pool_id in pool_ids if pool_id not in addresses]
+        if unknown:
+            async for document in collection.find({"_id": {"$in": unknown}}, {"address": 1}):
+                addresses[document["_id"]] = document["address"]
+                self._cache_address(document["_id"], document["address"])
+        return addresses
+
+
+fanout = FanOut()
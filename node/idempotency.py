@@ -0,0 +1,82 @@
+import hashlib
+import hmac
+import secrets
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable
+
+from fastapi import Response
+from pydantic import BaseModel
+
+from node import exceptions
+from node.config import config
+from node.storage import storage
+
+MAX_KEY_LENGTH = 255
+PENDING_TTL_SEC = 60  # a key of the request which is being processed is kept for this time at most
+# a random secret is valid within one process only, retries handled by other workers are then rejected
+SECRET = (config.IDEMPOTENCY_SECRET or secrets.token_hex(32)).encode()
+
+
+def check_config():
+    """Several workers (`FANOUT_MODE=mongo`) must share the secret: a retry may be handled by any of them."""
+    if config.FANOUT_MODE == "mongo" and not config.IDEMPOTENCY_SECRET:
+        raise ValueError(
+            "Fan-out mode `mongo` (several workers) requires `IDEMPOTENCY_SECRET` to be set."
+        )
+
+
+def fingerprint(*parts: Any) -> str:
+    """
+    Identifies the request a key was used with. Access keys are a part of it, so the saved response
+    is returned only to the client which has sent the original request. The fingerprint is keyed
+    with `IDEMPOTENCY_SECRET`, which is not stored, so access keys can not be guessed from the database.
+    """
+    return hmac.new(SECRET, "\0".join(map(str, parts)).encode(), hashlib.sha256).hexdigest()
+
+
+async def run(
+    key: str | None,
+    route: str,
+    pool: str,
+    request_fingerprint: str,
+    handler: Callable[[], Awaitable[BaseModel]],
+) -> BaseModel | Response:
+    """
+    Runs the handler once per (key, route, pool) within `IDEMPOTENCY_TTL_SEC`:
+    retries get the saved response of the first successful run.
+    """
+    if key is None:
+        return await handler()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise exceptions.UnprocessableEntityException(
+            f"`Idempotency-Key` must contain from 1 to {MAX_KEY_LENGTH} characters."
+        )
+
+    record = await storage.reserve_idempotency_key(
+        key, route, pool, request_fingerprint, datetime.utcnow() + timedelta(seconds=PENDING_TTL_SEC)
+    )
+    if record:
+        if record.fingerprint != request_fingerprint:
+            raise exceptions.UnprocessableEntityException(
+                "`Idempotency-Key` was already used with a different request."
+            )
+        if record.response is None:
+            raise exceptions.ConflictException("Request with this `Idempotency-Key` is being processed.")
+        return Response(
+            record.response, media_type="application/json", headers={"Idempotent-Replayed": "true"}
+        )
+
+    try:
+        result = await handler()
+    except BaseException:
+        # failed requests may be retried with the same key
+        await storage.release_idempotency_key(key, route, pool)
+        raise
+    await storage.complete_idempotency_key(
+        key,
+        route,
+        pool,
+        result.json().encode(),
+        datetime.utcnow() + timedelta(seconds=config.IDEMPOTENCY_TTL_SEC),
+    )
+    return result
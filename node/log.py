@@ -0,0 +1,40 @@
+import random
+import sys
+
+from loguru import logger
+
+from node.config import config
+
+LOG_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | "
+    "<cyan>{extra[request_id]}</cyan> | <level>{message}</level>"
+)
+
+
+def setup():
+    """Replaces default loguru sink with a queued one, so the event loop never blocks on stderr."""
+    logger.remove()
+    logger.configure(extra={"request_id": "-"})
+    logger.add(
+        sys.stderr,
+        level=config.LOG_LEVEL,
+        format=LOG_FORMAT,
+        serialize=config.LOG_JSON,
+        enqueue=True,
+        backtrace=False,
+        diagnose=False,
+    )
+
+
+def sampled(rate: float | None = None) -> bool:
+    rate = config.LOG_SAMPLE_RATE if rate is None else rate
+    return rate >= 1 or random.random() < rate
+
+
+def info_sampled(message: str, **fields):
+    """
+    Logs high-volume info message if it passes sampling (see `LOG_SAMPLE_RATE`).
+    Message is formatted lazily from `fields`, which are also attached to the record as extra.
+    """
+    if sampled():
+        logger.opt(depth=1).info(message, **fields)
@@ -1,19 +1,24 @@
-from beanie import init_beanie
-from fastapi import FastAPI, Request, status
+from fastapi import FastAPI, status
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from loguru import logger
-from motor import motor_asyncio
 
-from node import NODE_VERSION
+from node import NODE_VERSION, idempotency, log
+from node.compression import CompressionMiddleware
 from node.config import config
+from node.directory import directory
 from node.exceptions import APIException, InternalServerErrorException
-from node.models.database import Pool, Signature
+from node.fanout import fanout
+from node.middleware import RequestContextMiddleware
 from node.models.response import ResponseError
+from node.replication import replicator
 from node.routers.node import router as node_router
 from node.routers.pool import router as pool_router
 from node.routers.root import router as root_router
 from node.routers.signature import router as signature_router
+from node.storage import storage
+
+log.setup()
 
 tags_metadata = [
     {"name": "root", "description": "root route"},
@@ -41,7 +46,6 @@ tags_metadata = [
             "url": "https://evade84.github.io/getting-started/basic-definitions/#pool",
         },
     },
-
 ]
 
 app = FastAPI(
@@ -55,20 +59,9 @@ app = FastAPI(
 )
 
 
-@app.middleware("http")
-async def catch_exceptions_middleware(request: Request, call_next):
-    try:
-        return await call_next(request)
-    except Exception as exc:
-        logger.exception(exc)
-        return JSONResponse(
-            content=ResponseError(
-                error_id="InternalServerError",
-                error_message="Internal server error.",
-                error_details=None,
-            ).dict(),
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        )
+# the last added middleware is the outermost one: errors of compression are handled by request context
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(RequestContextMiddleware)
 
 
 @app.exception_handler(RequestValidationError)
@@ -97,12 +90,21 @@ async def api_exception_handler(_, exc: APIException):
 
 @app.on_event("startup")
 async def on_startup():
-    client = motor_asyncio.AsyncIOMotorClient(
-        f"mongodb://{config.MONGO_HOST}:{config.MONGO_PORT}/{config.MONGO_DB}"
-    )
-    await init_beanie(client[config.MONGO_DB], document_models=[Pool, Signature])
-    logger.info("Connected to the database.")
+    idempotency.check_config()
+    await storage.connect()
+    await fanout.start()
+    await directory.rebuild()
+    await replicator.start()
+    logger.info("Connected to the {backend} storage.", backend=config.STORAGE_BACKEND)
     app.include_router(root_router, tags=["root"])
     app.include_router(node_router, tags=["node"])
     app.include_router(signature_router, tags=["signature"])
     app.include_router(pool_router, tags=["pool"])
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await replicator.stop()
+    await fanout.stop()
+    await storage.close()
+    await logger.complete()
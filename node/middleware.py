@@ -0,0 +1,76 @@
+import time
+from uuid import uuid4
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+from loguru import logger
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from node import log
+from node.config import config
+from node.models.response import ResponseError
+
+REQUEST_ID_HEADER = b"x-request-id"
+PROCESS_TIME_HEADER = b"x-process-time"
+
+
+def _get_header(scope: Scope, name: bytes) -> bytes | None:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value
+    return None
+
+
+def _internal_server_error_response() -> JSONResponse:
+    return JSONResponse(
+        content=ResponseError(
+            error_id="InternalServerError",
+            error_message="Internal server error.",
+            error_details=None,
+        ).dict(),
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+    )
+
+
+class RequestContextMiddleware:
+    """Assigns request id, measures processing time and catches unhandled exceptions."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_id = (_get_header(scope, REQUEST_ID_HEADER) or uuid4().hex.encode())[:64]
+        scope.setdefault("state", {})["request_id"] = request_id.decode("latin-1")
+        started_at = time.perf_counter()
+        status_code = None
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed_ms = (time.perf_counter() - started_at) * 1000
+                headers = list(message.get("headers", []))
+                headers.append((REQUEST_ID_HEADER, request_id))
+                headers.append((PROCESS_TIME_HEADER, f"{elapsed_ms:.3f}".encode()))
+                message["headers"] = headers
+            await send(message)
+
+        with logger.contextualize(request_id=scope["state"]["request_id"]):
+            try:
+                await self.app(scope, receive, send_wrapper)
+            except Exception as exc:
+                logger.exception(exc)
+                if status_code is not None:  # headers are already sent, nothing can be done
+                    raise
+                await _internal_server_error_response()(scope, receive, send_wrapper)
+            if status_code is None or status_code >= 500 or log.sampled(config.LOG_ACCESS_SAMPLE_RATE):
+                logger.info(
+                    "{method} {route} {status_code} ({latency_ms:.2f} ms)",
+                    method=scope["method"],
+                    route=scope["path"],
+                    status_code=status_code,
+                    latency_ms=(time.perf_counter() - started_at) * 1000,
+                )
@@ -1,9 +1,9 @@
 from datetime import datetime
-from typing import Any
+from typing import Any, Type
 from uuid import UUID, uuid4
 
 from beanie import Document, Link
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, validate_model, validator
 from shortuuid import ShortUUID
 
 from node import auth
@@ -14,6 +14,14 @@ def short_uuid_factory():
     return ShortUUID().random(length=5)
 
 
+def build_document(model: Type[Document], **data) -> Document:
+    """Validates data and creates document without requiring beanie to be initialized (see `node.storage`)."""
+    values, fields_set, error = validate_model(model, data)
+    if error:
+        raise error
+    return model.construct(_fields_set=fields_set, **values)
+
+
 class Signature(Document):
     uuid: str = Field(default_factory=short_uuid_factory)
     key_hash: str
@@ -25,6 +33,11 @@ class Signature(Document):
     value: str
     created_at: datetime
 
+    revision: int = 0  # incremented on every update
+
+    # base URL of the node the signature is copied from with a replicated pool (see `node.replication`)
+    replica_of: str | None = None
+
     class Collection:
         name = "signatures"
 
@@ -33,7 +46,8 @@ class Signature(Document):
 
     @classmethod
     def from_request(cls, signature):
-        return cls(
+        return build_document(
+            cls,
             key_hash=auth.hash_key(signature.key),
             value=signature.value,
             description=signature.description,
@@ -64,6 +78,13 @@ class EncryptedMessage(Message):
         return f"EncryptedMessage({len(self.AES_ciphertext)} chars by={self.signature})"
 
 
+def message_size(message: Message) -> int:
+    """Size of the message content in bytes, as counted in `Pool.stored_bytes`."""
+    if message.type == MessageType.plaintext:
+        return len(message.plaintext.encode())
+    return len(message.AES_ciphertext) + len(message.AES_nonce) + len(message.AES_tag)
+
+
 class Pool(Document):
     type: PoolType
     uuid: UUID = Field(default_factory=uuid4)
@@ -88,6 +109,21 @@ class Pool(Document):
     # encryption settings (only pools with type `chat` can be encrypted)
     encrypted: bool
 
+    # messages of ephemeral pools are kept in memory only (see `node.ephemeral`)
+    ephemeral: bool = False
+
+    # base URL of the node the pool is replicated from, replicas are read-only (see `node.replication`)
+    replica_of: str | None = None
+
+    # version of the pool, used to build ETags: revision is incremented on every metadata update
+    revision: int = 0
+    last_message_id: int = 0
+
+    # activity counters, updated together with every write
+    message_count: int = 0
+    last_message_at: datetime | None = None
+    stored_bytes: int = 0  # total size of message contents, see `message_size`
+
     messages: list[PlaintextMessage | EncryptedMessage] = []
 
     class Collection:
@@ -106,7 +142,8 @@ class Pool(Document):
         writer_key_hash = auth.hash_key(pool.writer_key) if pool.writer_key else None
         reader_key_hash = auth.hash_key(pool.reader_key) if pool.reader_key else None
 
-        return cls(
+        return build_document(
+            cls,
             type=pool_type,
             tag=pool.tag,
             description=pool.description,
@@ -117,5 +154,6 @@ class Pool(Document):
             writer_key_hash=writer_key_hash,
             reader_key_hash=reader_key_hash,
             encrypted=bool(pool.encrypted),
+            ephemeral=bool(pool.ephemeral),
             messages=[],
         )
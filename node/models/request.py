@@ -1,3 +1,6 @@
+from datetime import datetime
+from typing import Any
+
 from pydantic import BaseModel, Extra, Field
 
 from node.enums import MessageType, PoolType
@@ -47,6 +50,9 @@ class RequestUpdateSignature(BaseModel):
     new_description: str | None = DescriptionField()
     new_key: str | None = KeyField(optional=True)
 
+    # revision the client has seen: the update is rejected if the signature was updated since then
+    revision: int | None = Field(default=None, ge=0)
+
     class Config:
         schema_extra = (
             {
@@ -54,6 +60,7 @@ class RequestUpdateSignature(BaseModel):
                     "new_value": "Bart Simpson",
                     "new_description": "This is totally new description.",
                     "new_key": "a-new-stronger-key",
+                    "revision": 0,
                 },
                 "extra": Extra.forbid,
             },
@@ -66,6 +73,7 @@ class RequestNewPool(BaseModel):
 
     public: bool | None = Field(default=False)
     encrypted: bool | None = Field(default=False)
+    ephemeral: bool | None = Field(default=False)
 
     creator_signature: RequestSignature | None = Field(default=None)
 
@@ -80,6 +88,7 @@ class RequestNewPool(BaseModel):
                 "description": "Friends' chat.",
                 "public": False,
                 "encrypted": False,
+                "ephemeral": False,
                 "creator_signature": None,
                 "master_key": "secret-master-key",
                 "writer_key": "secret-writer-key",
@@ -129,6 +138,9 @@ class RequestUpdatePool(BaseModel):
     new_writer_key: str | None = KeyField(optional=True)
     new_reader_key: str | None = KeyField(optional=True)
 
+    # revision the client has seen: the update is rejected if the pool was updated since then
+    revision: int | None = Field(default=None, ge=0)
+
     class Config:
         schema_extra = {
             "example": {
@@ -136,6 +148,7 @@ class RequestUpdatePool(BaseModel):
                 "new_master_key": "a-new-stronger-master-key",
                 "new_writer_key": "a-new-stronger-writer-key",
                 "new_reader_key": "a-new-stronger-reader-key",
+                "revision": 0,
             },
             "extra": Extra.forbid,
         }
@@ -185,3 +198,12 @@ class RequestNewMessage(BaseModel):
                 raise ValueError("Invalid message type.")
 
         return errors
+
+
+class RequestImportMessage(RequestNewMessage):
+    """One line of NDJSON import (the format of the pool export)."""
+
+    type: MessageType
+    id: int | None = Field(default=None)
+    date: datetime
+    signature: Any = Field(default=None)  # signatures belong to the origin node, they are not imported
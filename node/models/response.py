@@ -18,6 +18,7 @@ class ResponseSignature(BaseModel):
     value: str
     description: str | None
     created_at: datetime
+    revision: int
 
     @classmethod
     def from_db_model(cls, signature: database.Signature):
@@ -26,6 +27,7 @@ class ResponseSignature(BaseModel):
             value=signature.value,
             description=signature.description,
             created_at=signature.created_at,
+            revision=signature.revision,
         )
 
 
@@ -35,12 +37,21 @@ class ResponsePool(BaseModel):
     tag: str | None
     address: str
     encrypted: bool
+    ephemeral: bool
+    replica_of: str | None = None
 
     public: bool
     description: str | None = None
 
     created_at: datetime
     creator_signature: Optional[ResponseSignature]
+    revision: int
+
+    # activity (messages of ephemeral pools which are still kept in memory)
+    message_count: int
+    last_message_id: int
+    last_message_at: datetime | None
+    stored_bytes: int
 
     @classmethod
     def from_db_model(cls, pool: database.Pool):
@@ -58,6 +69,13 @@ class ResponsePool(BaseModel):
             created_at=pool.created_at,
             creator_signature=creator_signature,
             encrypted=pool.encrypted,
+            ephemeral=pool.ephemeral,
+            replica_of=pool.replica_of,
+            revision=pool.revision,
+            message_count=pool.message_count,
+            last_message_id=pool.last_message_id,
+            last_message_at=pool.last_message_at,
+            stored_bytes=pool.stored_bytes,
         )
 
 
@@ -110,9 +128,49 @@ class ResponseMessages(BaseModel):
     total: int
     count: int
     encrypted: bool
+    has_more: bool  # there are more messages beyond the returned ones (in the requested direction)
     messages: list[ResponsePlaintextMessage | ResponseEncryptedMessage]
 
 
+class ResponseFoundMessages(BaseModel):
+    count: int
+    messages: list[ResponsePlaintextMessage]
+    next_before_id: int | None  # pass as `before_id` to get the next page, `None` on the last page
+
+
+class ResponseSignatureMessage(BaseModel):
+    pool_address: str
+    pool_tag: str | None
+    message: ResponsePlaintextMessage | ResponseEncryptedMessage
+
+
+class ResponseSignatureMessages(BaseModel):
+    count: int
+    messages: list[ResponseSignatureMessage]
+    next_cursor: str | None  # pass as `cursor` to get the next page, `None` on the last page
+
+
+class ResponseImportedMessages(BaseModel):
+    count: int
+    last_message_id: int | None
+
+
+class ResponseReplicatedPool(BaseModel):
+    address: str
+    tag: str | None
+    local_last_message_id: int
+    peer_last_message_id: int | None  # as of the last successful request to the peer
+    lag_messages: int | None
+    lag_sec: float | None  # time since the replica was last known to have all messages of the peer
+    synced_at: datetime | None
+    error: str | None
+
+
+class ResponseReplication(BaseModel):
+    peer: str | None
+    pools: list[ResponseReplicatedPool]
+
+
 class ResponseNode(BaseModel):
     name: str
     description: str
@@ -120,3 +178,5 @@ class ResponseNode(BaseModel):
     uptime_sec: int
     pools_count: int
     signatures_count: int
+    messages_count: int  # messages of ephemeral pools are not counted
+    stored_bytes: int
@@ -1,3 +1,5 @@
+import base64
+import json
 from operator import xor
 from typing import Any, NoReturn
 
@@ -33,3 +35,15 @@ def paginate_first_last(x: list[Any], first: int = None, last: int | None = None
 
 def paginate_limit_offset(x, limit: int, offset: int) -> list[Any]:
     return x[offset : offset + limit]
+
+
+def encode_cursor(*values: Any) -> str:
+    """Encodes keyset pagination position into opaque string."""
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> list[Any] | NoReturn:
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise exceptions.UnprocessableEntityException("Invalid `cursor`.")
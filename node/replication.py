@@ -0,0 +1,285 @@
+import asyncio
+import secrets
+import time
+from datetime import datetime
+from typing import Any
+from uuid import UUID
+
+import httpx
+from loguru import logger
+from pydantic import ValidationError
+
+from node import auth, exceptions, util
+from node.config import config
+from node.directory import directory
+from node.fanout import fanout
+from node.models import database, request, response
+from node.storage import storage
+from node.storage.base import NewMessage
+
+
+class ReplicationError(Exception):
+    pass
+
+
+class _PoolState:
+    __slots__ = ("identifier", "pool", "peer_last_message_id", "synced_at", "caught_up", "error")
+
+    def __init__(self, identifier: str):
+        self.identifier = identifier
+        self.pool: database.Pool | None = None  # local replica
+        self.peer_last_message_id: int | None = None
+        self.synced_at: float | None = None  # when the replica was last known to have all messages
+        self.caught_up = False
+        self.error: str | None = None
+
+    def to_response_model(self) -> response.ResponseReplicatedPool:
+        local_last_message_id = self.pool.last_message_id if self.pool else 0
+        lag_messages = lag_sec = None
+        if self.peer_last_message_id is not None:
+            lag_messages = max(self.peer_last_message_id - local_last_message_id, 0)
+        if self.caught_up and not self.error:
+            lag_sec = 0.0
+        elif self.synced_at is not None:
+            lag_sec = round(time.time() - self.synced_at, 3)
+        return response.ResponseReplicatedPool(
+            address=self.pool.address if self.pool else self.identifier,
+            tag=self.pool.tag if self.pool else None,
+            local_last_message_id=local_last_message_id,
+            peer_last_message_id=self.peer_last_message_id,
+            lag_messages=lag_messages,
+            lag_sec=lag_sec,
+            synced_at=datetime.fromtimestamp(self.synced_at) if self.synced_at else None,
+            error=self.error,
+        )
+
+
+class Replicator:
+    """
+    Pull replication of public pools from a peer node.
+
+    Every followed pool gets a local read-only replica with the same address, tag and message ids.
+    New messages are fetched in batches by long polling `/pool/{address}/poll` of the peer with the
+    last replicated id as a cursor, so the replica catches up after any downtime of the peer or of this
+    node. Signatures of replicated messages are copied as well (with keys nobody knows).
+    Every worker of the node replicates: writes are conditional on the last replicated id, so a batch
+    is written once, other workers get a conflict and continue from the new last message.
+    """
+
+    def __init__(self):
+        self.peer: str | None = None
+        self._states: dict[str, _PoolState] = {}
+        self._signatures: dict[str, database.Signature] = {}
+        self._client: httpx.AsyncClient | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self, transport: httpx.AsyncBaseTransport | None = None):
+        identifiers = [identifier.strip() for identifier in config.REPLICATION_POOLS.split(",")]
+        identifiers = [identifier for identifier in identifiers if identifier]
+        if not identifiers:
+            return
+        if not config.REPLICATION_PEER:
+            raise ValueError("`REPLICATION_POOLS` requires `REPLICATION_PEER` to be set.")
+        self.peer = config.REPLICATION_PEER.rstrip("/")
+        self._client = httpx.AsyncClient(
+            base_url=self.peer,
+            timeout=httpx.Timeout(10, read=config.REPLICATION_POLL_TIMEOUT_SEC + 10),
+            transport=transport,
+        )
+        for identifier in identifiers:
+            state = self._states[identifier] = _PoolState(identifier)
+            self._tasks.append(asyncio.create_task(self._follow_forever(state)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    def get_status(self) -> response.ResponseReplication:
+        return response.ResponseReplication(
+            peer=self.peer, pools=[state.to_response_model() for state in self._states.values()]
+        )
+
+    async def _get(self, path: str, **params) -> dict[str, Any]:
+        result = await self._client.get(path, params=params)
+        if result.status_code != 200:
+            try:
+                message = result.json()["error_message"]
+            except (ValueError, KeyError, TypeError):
+                message = result.reason_phrase
+            raise ReplicationError(f"peer responded with {result.status_code}: {message}")
+        return result.json()
+
+    async def _follow_forever(self, state: _PoolState):
+        delay = 0.5
+        while True:
+            synced_at = state.synced_at
+            try:
+                # (re)connected: metadata of the pool may have changed meanwhile
+                state.pool = await self._open_replica(state.identifier)
+                await self._follow(state)
+            except (httpx.HTTPError, ReplicationError, ValidationError) as exc:
+                state.caught_up = False
+                state.error = str(exc) or exc.__class__.__name__
+                logger.warning(
+                    "Replication of pool {identifier} from {peer} failed: {error}.",
+                    identifier=state.identifier,
+                    peer=self.peer,
+                    error=state.error,
+                )
+            except Exception as exc:  # noqa
+                state.caught_up = False
+                state.error = "internal error"
+                logger.exception(exc)
+            if state.synced_at != synced_at:  # the peer was reachable after the previous failure
+                delay = 0.5
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+    async def _open_replica(self, identifier: str) -> database.Pool:
+        """Returns the local replica of the peer pool, creates it if there is none."""
+        peer_pool = response.ResponsePool.parse_obj(await self._get(f"/pool/{identifier}"))
+        if not peer_pool.public or peer_pool.ephemeral:
+            raise ReplicationError("only public persistent pools can be replicated")
+
+        pool = await storage.get_pool(peer_pool.address, with_messages=False)
+        if pool is not None:
+            if pool.address != peer_pool.address or pool.replica_of != self.peer:
+                raise ReplicationError(
+                    f"pool {identifier} already exists and is not a replica of the peer"
+                )
+            if pool.description != peer_pool.description and await storage.update_pool(
+                pool, {"description": peer_pool.description}
+            ):
+                pool.description, pool.revision = peer_pool.description, pool.revision + 1
+            directory.put(pool)
+            return pool
+
+        if peer_pool.tag and await storage.get_pool(peer_pool.tag, with_messages=False):
+            raise ReplicationError(f"tag {peer_pool.tag} is already in use by another local pool")
+        pool = database.build_document(
+            database.Pool,
+            type=peer_pool.type,
+            uuid=UUID(hex=peer_pool.address),
+            tag=peer_pool.tag,
+            description=peer_pool.description,
+            public=True,
+            creator_signature=await self._get_signature(peer_pool.creator_signature),
+            created_at=peer_pool.created_at,
+            master_key_hash=auth.hash_key(secrets.token_urlsafe(32)),  # nobody may manage the replica
+            writer_key_hash=None,
+            reader_key_hash=None,
+            encrypted=peer_pool.encrypted,
+            replica_of=self.peer,
+            messages=[],
+        )
+        try:
+            await storage.create_pool(pool)
+        except Exception:  # noqa
+            # another worker may have created the replica meanwhile
+            replica = await storage.get_pool(peer_pool.address, with_messages=False)
+            if replica is None or replica.replica_of != self.peer:
+                raise
+            return replica
+        directory.put(pool)
+        logger.info(
+            "Created replica of pool {address} from {peer}.", address=pool.address, peer=self.peer
+        )
+        return pool
+
+    async def _get_signature(
+        self, signature: response.ResponseSignature | None
+    ) -> database.Signature | None:
+        """Returns local copy of the peer signature, creates it if there is none."""
+        if signature is None:
+            return None
+        local_signature = self._signatures.get(signature.uuid) or await storage.get_signature(
+            signature.uuid
+        )
+        if local_signature is None:
+            local_signature = database.build_document(
+                database.Signature,
+                uuid=signature.uuid,
+                key_hash=auth.hash_key(secrets.token_urlsafe(32)),
+                description=signature.description,
+                value=signature.value,
+                created_at=signature.created_at,
+                replica_of=self.peer,
+            )
+            try:
+                await storage.create_signature(local_signature)
+            except Exception:  # noqa
+                # another worker may have copied the signature meanwhile
+                local_signature = await storage.get_signature(signature.uuid)
+                if local_signature is None:
+                    raise
+        if local_signature.replica_of != self.peer:
+            # short uuids of different nodes may collide: messages must not be attributed to a local user
+            raise ReplicationError(
+                f"signature {signature.uuid} of the peer collides with a signature of this node"
+            )
+        self._signatures[signature.uuid] = local_signature
+        return local_signature
+
+    async def _follow(self, state: _PoolState):
+        pool = state.pool
+        while True:
+            page = await self._get(
+                f"/pool/{pool.address}/poll",
+                after_id=pool.last_message_id,
+                limit=config.REPLICATION_BATCH_SIZE,
+                timeout=config.REPLICATION_POLL_TIMEOUT_SEC if state.caught_up else 0,
+            )
+            state.peer_last_message_id, state.error = page["total"], None
+            messages = [message for message in page["messages"] if message["id"] > pool.last_message_id]
+            if messages:
+                await self._write(pool, messages)
+            state.caught_up = not page["has_more"]
+            if state.caught_up:
+                state.synced_at = time.time()
+
+    async def _write(self, pool: database.Pool, messages: list[dict[str, Any]]):
+        if messages[0]["id"] != pool.last_message_id + 1:
+            raise ReplicationError(
+                f"expected message {pool.last_message_id + 1} from the peer, got {messages[0]['id']}"
+            )
+        new_messages = []
+        for message in messages:
+            signature = message.pop("signature", None)
+            parsed = request.RequestImportMessage.parse_obj(message)
+            new_messages.append(
+                NewMessage(
+                    parsed.type,
+                    parsed,
+                    await self._get_signature(response.ResponseSignature.parse_obj(signature))
+                    if signature
+                    else None,
+                    util.to_local_naive(parsed.date),
+                )
+            )
+        try:
+            # ids of the peer are kept only if nobody has written to the replica meanwhile
+            db_messages = await storage.write_messages(pool, new_messages, after_id=pool.last_message_id)
+        except exceptions.MessageIdConflictException:
+            # another worker has replicated the batch: continue after the last message of the replica
+            replica = await storage.get_pool(pool.address, with_messages=False)
+            if replica is None:
+                raise ReplicationError("replica of the pool was deleted")
+            pool.last_message_id = replica.last_message_id
+            return
+        except exceptions.PoolDoesNotExistException:
+            raise ReplicationError("replica of the pool was deleted")
+        fanout.publish(pool.address, db_messages[-1].id)
+        directory.update_counters(pool)
+        logger.info(
+            "Replicated {count} messages of pool {address}.",
+            count=len(db_messages),
+            address=pool.address,
+        )
+
+
+replicator = Replicator()
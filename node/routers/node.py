@@ -4,6 +4,8 @@ from fastapi import APIRouter
 
 from node import NODE_VERSION, START_TIME, models, util
 from node.config import config
+from node.replication import replicator
+from node.storage import storage
 
 router = APIRouter(prefix="/node")
 
@@ -16,14 +18,27 @@ router = APIRouter(prefix="/node")
     response_model=models.response.ResponseNode,
 )
 async def get_node():
-    pools_count = await models.database.Pool.count()
-    signatures_count = await models.database.Signature.count()
+    totals = await storage.get_pool_totals(allow_stale=True)
+    signatures_count = await storage.count_signatures(allow_stale=True)
 
     return models.response.ResponseNode(
         name=config.NODE_NAME,
         description=config.NODE_DESCRIPTION,
         version=NODE_VERSION,
         uptime_sec=time.time() - START_TIME,
-        pools_count=pools_count,
+        pools_count=totals.pools_count,
         signatures_count=signatures_count,
+        messages_count=totals.messages_count,
+        stored_bytes=totals.stored_bytes,
     )
+
+
+@router.get(
+    "/replication",
+    summary="Get replication status",
+    description="Returns pools replicated from the peer node (see `REPLICATION_PEER`) and their lag.",
+    responses=util.generate_responses("Returns replication status.", api_exceptions=[]),
+    response_model=models.response.ResponseReplication,
+)
+async def get_replication():
+    return replicator.get_status()
@@ -1,35 +1,111 @@
-from typing import Union
+import re
+from datetime import datetime
+from typing import AsyncIterator, Union
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Header, Request, Response
+from fastapi.responses import StreamingResponse
 from loguru import logger
+from pydantic import ValidationError
 
-from node import auth, crud, exceptions, models, pagination, util
-from node.enums import MessageType, PoolType
+from node import auth, ephemeral, etag, exceptions, idempotency, log, models, pagination, util
+from node.coalescer import coalescer
+from node.config import config
+from node.directory import directory
+from node.enums import MessageType, PoolSort, PoolType
+from node.fanout import fanout
+from node.storage import storage
+from node.storage.base import NewMessage
 
 router = APIRouter(prefix="/pool")
 
 
-@router.post(
-    "/create",
-    response_model=models.response.ResponsePool,
-    summary="Create a new pool",
-    description="Creates new pool.",
-    responses=util.generate_responses(
-        "Returns newly created pool object.",
-        api_exceptions=[exceptions.ConflictException],
-    ),
-)
-async def create_pool(
-    pool_type: PoolType,  # noqa
-    new_pool: models.request.RequestNewPool,
-):
+async def read_messages(
+    pool: models.database.Pool,
+    first: int | None = None,
+    last: int | None = None,
+    after_id: int | None = None,
+    allow_stale: bool = False,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> tuple[int, list, bool]:
+    """Returns total count of pool messages, the requested page of them and whether there are more."""
+    # read one more message than requested to find out if there are more of them
+    first, last = first and first + 1, last and last + 1
+    if pool.ephemeral:
+        buffer = ephemeral.get_buffer(pool)
+        if since or until:
+            records = [
+                record
+                for record in buffer.first(len(buffer), after_id or 0)
+                if (not since or record.date >= since) and (not until or record.date < until)
+            ]
+            records = pagination.paginate_first_last(records, first, last)
+        else:
+            records = buffer.first(first, after_id or 0) if first else buffer.last(last, after_id or 0)
+        total, messages = len(buffer), [record.to_response_model() for record in records]
+    else:
+        total, messages = await storage.read_messages(
+            pool, first, last, after_id, allow_stale, since, until
+        )
+    has_more = len(messages) == (first or last)
+    if has_more:
+        messages = messages[:-1] if first else messages[1:]
+    return total, messages, has_more
+
+
+def pool_etag(pool: models.database.Pool) -> str:
+    """
+    Version of the pool and its messages. Signatures of messages are not a part of it (only the creator
+    signature is): after a signature update, cached pages may show the previous value until the pool changes.
+    """
+    signature_revision = getattr(pool.creator_signature, "revision", None)  # unresolved links have none
+    if pool.ephemeral:
+        # messages of ephemeral pools are lost on restart and their ids start over
+        last_message_id = ephemeral.get_buffer(pool).last_id
+        return etag.build(etag.EPOCH, pool.address, pool.revision, last_message_id, signature_revision)
+    return etag.build(pool.address, pool.revision, pool.last_message_id, signature_revision)
+
+
+def check_line_length(line_number: int, line: bytes):
+    if len(line) > config.IMPORT_MAX_LINE_BYTES:
+        raise exceptions.UnprocessableEntityException(
+            f"Line {line_number} is longer than {config.IMPORT_MAX_LINE_BYTES} bytes."
+        )
+
+
+async def iter_lines(request: Request) -> AsyncIterator[tuple[int, bytes]]:
+    """Yields numbered non-empty lines of the request body."""
+    line_number = 0
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            check_line_length(line_number, line)
+            if line.strip():
+                yield line_number, line
+        # an unfinished line is not buffered beyond the limit either
+        check_line_length(line_number + 1, buffer)
+    if buffer.strip():
+        yield line_number + 1, buffer
+
+
+async def create_new_pool(
+    pool_type: PoolType, new_pool: models.request.RequestNewPool
+) -> models.response.ResponsePool:
     errors = new_pool.validate_based_on_type(pool_type)
     if errors:
         raise exceptions.UnprocessableEntityException(
             util.build_errors_message("Incorrect pool fields", errors)
         )
 
-    if new_pool.tag and await crud.get_pool(new_pool.tag):
+    if new_pool.ephemeral and config.FANOUT_MODE == "mongo":
+        # every worker would keep its own buffer: ids would repeat and reads would miss messages
+        raise exceptions.ConflictException(
+            "Ephemeral pools are not available on nodes running several workers (`FANOUT_MODE=mongo`)."
+        )
+    if new_pool.tag and await storage.get_pool(new_pool.tag):
         raise exceptions.ConflictException("Tag is already in use.")
     creator_signature = (
         await util.get_verified_signature(new_pool.creator_signature)
@@ -37,38 +113,77 @@ async def create_pool(
         else None
     )
     db_pool = models.database.Pool.from_request_model(pool_type, new_pool, creator_signature)
-    await db_pool.save()
-    logger.info(f"Created new pool: {db_pool}.")
+    await storage.create_pool(db_pool)
+    directory.put(db_pool)
+    logger.info(
+        "Created new pool {address} ({pool_type}).",
+        address=db_pool.address,
+        pool_type=db_pool.type.value,
+    )
     return models.response.ResponsePool.from_db_model(db_pool)
 
 
+@router.post(
+    "/create",
+    response_model=models.response.ResponsePool,
+    summary="Create a new pool",
+    description="Creates new pool. Pass unique `Idempotency-Key` header to retry the request safely.",
+    responses=util.generate_responses(
+        "Returns newly created pool object.",
+        api_exceptions=[exceptions.ConflictException],
+    ),
+)
+async def create_pool(
+    pool_type: PoolType,  # noqa
+    new_pool: models.request.RequestNewPool,
+    idempotency_key: str | None = Header(None),
+):
+    return await idempotency.run(
+        idempotency_key,
+        "create",
+        "",
+        idempotency.fingerprint(pool_type.value, new_pool.json()),
+        lambda: create_new_pool(pool_type, new_pool),
+    )
+
+
 @router.post(
     "/{identifier}/update",
     response_model=models.response.ResponsePool,
     summary="Update pool",
     description="Updates some pool fields.",
     responses=util.generate_responses(
-        "Returns updated pool object", api_exceptions=[exceptions.AccessDeniedException]
+        "Returns updated pool object",
+        api_exceptions=[exceptions.AccessDeniedException, exceptions.StaleRevisionException],
     ),
 )
 async def update_pool(identifier: str, master_key: str, pool_data: models.request.RequestUpdatePool):
-    pool = await crud.get_pool(identifier)
+    pool = await storage.get_pool(identifier, with_messages=False)
     if not pool:
         raise exceptions.PoolDoesNotExistException()
     if not auth.verify_key(master_key, pool.master_key_hash):
         raise exceptions.InvalidMasterKeyException()
+    if pool_data.revision is not None and pool_data.revision != pool.revision:
+        raise exceptions.StaleRevisionException()
 
+    fields = {}
     if pool_data.new_description:
-        pool.description = pool_data.new_description
+        fields["description"] = pool_data.new_description
     if pool_data.new_master_key:
-        pool.master_key_hash = auth.hash_key(pool_data.new_master_key)
+        fields["master_key_hash"] = auth.hash_key(pool_data.new_master_key)
     if pool_data.new_writer_key:
-        pool.writer_key_hash = auth.hash_key(pool_data.new_writer_key)
+        fields["writer_key_hash"] = auth.hash_key(pool_data.new_writer_key)
     if pool_data.new_reader_key:
-        pool.reader_key_hash = auth.hash_key(pool_data.new_reader_key)
-    await pool.save()
-    logger.info(f"Updated pool {pool}.")
-    return models.response.ResponsePool.from_db_model(pool)
+        fields["reader_key_hash"] = auth.hash_key(pool_data.new_reader_key)
+    # only the changed fields are written, and only if nobody has updated the pool since it was read
+    if not await storage.update_pool(pool, fields):
+        raise exceptions.StaleRevisionException()
+    for field, value in fields.items():
+        setattr(pool, field, value)
+    pool.revision += 1
+    directory.put(pool)
+    logger.info("Updated pool {address}.", address=pool.address)
+    return models.response.ResponsePool.from_db_model(ephemeral.apply_counters(pool))
 
 
 @router.delete(
@@ -82,16 +197,45 @@ async def update_pool(identifier: str, master_key: str, pool_data: models.reques
     ),
 )
 async def delete_pool(identifier: str, master_key: str):
-    pool = await crud.get_pool(identifier)
+    pool = await storage.get_pool(identifier, with_messages=False)
     if not pool:
         raise exceptions.PoolDoesNotExistException()
     if not auth.verify_key(master_key, pool.master_key_hash):
         raise exceptions.InvalidMasterKeyException()
-    await pool.delete()
-    logger.info(f"Deleted pool {pool}.")
+    await storage.delete_pool(pool)
+    directory.remove(pool)
+    if pool.ephemeral:
+        ephemeral.drop_buffer(pool)
+    fanout.publish(pool.address, None)
+    logger.info("Deleted pool {address}.", address=pool.address)
     return models.response.ResponsePool.from_db_model(pool)
 
 
+@router.get(
+    "/list",
+    response_model=models.response.ResponsePools,
+    summary="Get list of all public pools",
+    description="Returns list of public pool objects. The list is served from a snapshot, "
+    "so recently created pools may appear with a delay. Pools are sorted by `sort`: oldest first "
+    "(`created_at`), recently active first (`last_message_at`) or largest first (`message_count`).",
+    responses=util.generate_responses(
+        "Returns list of public pool objects.", api_exceptions=[], conditional=True
+    ),
+)
+async def list_public_pools(
+    limit: int,
+    offset: int,
+    sort: PoolSort = PoolSort.created_at,
+    if_none_match: str | None = Header(None),
+):
+    pagination.validate_limit_offset_params(limit, offset)
+    body, page_version = await directory.get_page(limit, offset, sort)
+    headers = {"ETag": page_version, "Cache-Control": f"public, max-age={config.DIRECTORY_MAX_AGE_SEC}"}
+    if etag.matches(if_none_match, page_version):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
 @router.get(
     "/{identifier}",
     response_model=models.response.ResponsePool,
@@ -100,15 +244,18 @@ async def delete_pool(identifier: str, master_key: str):
     responses=util.generate_responses(
         "Returns requested pool object.",
         api_exceptions=[exceptions.PoolDoesNotExistException, exceptions.AccessDeniedException],
+        conditional=True,
     ),
 )
 async def get_pool(
     identifier: str,
+    response: Response,
     master_key: str | None = None,
     writer_key: str | None = None,
     reader_key: str | None = None,
+    if_none_match: str | None = Header(None),
 ):
-    pool = await crud.get_pool(identifier)
+    pool = await storage.get_pool(identifier, with_messages=False)
     if not pool:
         raise exceptions.PoolDoesNotExistException()
     if not pool.public:
@@ -125,55 +272,26 @@ async def get_pool(
             raise exceptions.AccessDeniedException(
                 "The pool is not public: master, writer or reader key is required to get information about this pool."
             )
-    logger.info(f"Returned info about pool {pool}.")
-    return models.response.ResponsePool.from_db_model(pool)
+    pool_version = pool_etag(pool)
+    if etag.matches(if_none_match, pool_version):
+        return etag.not_modified(pool_version)
+    response.headers["ETag"] = pool_version
+    return models.response.ResponsePool.from_db_model(ephemeral.apply_counters(pool))
 
 
-@router.get(
-    "/list",
-    response_model=models.response.ResponsePools,
-    summary="Get list of all public pools",
-    description="Returns list of public pool objects.",
-    responses=util.generate_responses("Returns list of public pool objects.", api_exceptions=[]),
-)
-async def list_public_pools(limit: int, offset: int):
-    pagination.validate_limit_offset_params(limit, offset)
-    pools = await crud.get_public_pools()
-    target_pools = pagination.paginate_limit_offset(pools, limit, offset)
-    return models.response.ResponsePools(
-        total=len(pools),
-        count=len(target_pools),
-        pools=[models.response.ResponsePool.from_db_model(db_pool) for db_pool in target_pools],
-    )
-
-
-@router.post(
-    "/{identifier}/write",
-    response_model=Union[
-        models.response.ResponsePlaintextMessage, models.response.ResponseEncryptedMessage
-    ],
-    summary="Write a message to pool",
-    description="Adds a new message to pool messages list, returns newly created message object.",
-    responses=util.generate_responses(
-        "Returns newly created message object.",
-        [exceptions.PoolDoesNotExistException, exceptions.AccessDeniedException],
-    ),
-)
-async def write_to_pool(
-    identifier: str,
+async def write_message(
+    pool: models.database.Pool,
     message_type: MessageType,
     message: models.request.RequestNewMessage,
-    writer_key: str | None = None,
-):
+    writer_key: str | None,
+) -> models.response.ResponsePlaintextMessage | models.response.ResponseEncryptedMessage:
     errors = message.validate_based_on_type(message_type)
     if errors:
         raise exceptions.UnprocessableEntityException(
             util.build_errors_message("Invalid message fields", errors)
         )
-
-    pool = await crud.get_pool(identifier)
-    if not pool:
-        raise exceptions.PoolDoesNotExistException()
+    if pool.replica_of:
+        raise exceptions.ReadOnlyReplicaException()
 
     if pool.writer_key_hash:
         if not writer_key:
@@ -188,50 +306,335 @@ async def write_to_pool(
         )
 
     signature = await util.get_verified_signature(message.signature) if message.signature else None
-    db_message = await crud.write_message_to_pool(pool, message_type, message, signature)
-    logger.info(f"Wrote a new message to pool {pool}: {db_message}.")
+    if pool.ephemeral:
+        db_message = ephemeral.write_message_to_pool(pool, message_type, message, signature)
+        directory.update_counters(pool)
+    else:
+        db_message = await coalescer.write(
+            pool, NewMessage(message_type, message, signature, datetime.now())
+        )
+    fanout.publish(pool.address, db_message.id)
+    log.info_sampled(
+        "Wrote message {message_id} to pool {address}.", address=pool.address, message_id=db_message.id
+    )
+    return util.build_response_message(db_message)
 
-    match db_message.type:
-        case MessageType.plaintext:
-            return models.response.ResponsePlaintextMessage.from_db_model(db_message)
-        case MessageType.encrypted:
-            return models.response.ResponseEncryptedMessage.from_db_model(db_message)
-        case _:
-            raise ValueError("Invalid message type.")
+
+@router.post(
+    "/{identifier}/write",
+    response_model=Union[
+        models.response.ResponsePlaintextMessage, models.response.ResponseEncryptedMessage
+    ],
+    summary="Write a message to pool",
+    description="Adds a new message to pool messages list, returns newly created message object. "
+    "Pass unique `Idempotency-Key` header to retry the request safely.",
+    responses=util.generate_responses(
+        "Returns newly created message object.",
+        [
+            exceptions.PoolDoesNotExistException,
+            exceptions.AccessDeniedException,
+            exceptions.ReadOnlyReplicaException,
+        ],
+    ),
+)
+async def write_to_pool(
+    identifier: str,
+    message_type: MessageType,
+    message: models.request.RequestNewMessage,
+    writer_key: str | None = None,
+    idempotency_key: str | None = Header(None),
+):
+    pool = await storage.get_pool(identifier, with_messages=False)
+    if not pool:
+        raise exceptions.PoolDoesNotExistException()
+    # keys are scoped by the address, as the same pool may be written to by its tag
+    return await idempotency.run(
+        idempotency_key,
+        "write",
+        pool.address,
+        idempotency.fingerprint(message_type.value, writer_key, message.json()),
+        lambda: write_message(pool, message_type, message, writer_key),
+    )
 
 
 @router.get(
     "/{identifier}/read",
     response_model=models.response.ResponseMessages,
     summary="Read messages from pool",
-    description="Returns list of messages from the requested pool.",
+    description="Returns list of messages from the requested pool. "
+    "If `since` or `until` is specified, only messages with `since <= date < until` are returned, "
+    "ordered by date.",
     responses=util.generate_responses(
         "Returns list of messages from the requested pool.",
         [exceptions.PoolDoesNotExistException, exceptions.AccessDeniedException],
+        conditional=True,
     ),
 )
 async def read_pool(
     identifier: str,
+    response: Response,
     first: int | None = None,
     last: int | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
     reader_key: str | None = None,
+    if_none_match: str | None = Header(None),
 ):
     pagination.validate_first_last_params(first, last)
-    pool = await crud.get_pool(identifier)
+    since, until = util.to_local_naive(since), util.to_local_naive(until)
+    if since and until and since >= until:
+        raise exceptions.UnprocessableEntityException("`since` must be earlier than `until`.")
+    pool = await storage.get_pool(identifier, allow_stale=True, with_messages=False)
     if not pool:
         raise exceptions.PoolDoesNotExistException()
-    if pool.reader_key_hash:
-        if reader_key:
-            if not auth.verify_key(reader_key, pool.reader_key_hash):
-                raise exceptions.InvalidReaderKeyException()
-        else:
-            raise exceptions.AccessDeniedException("Reader key is required to read this pool.")
+    util.verify_reader_key(pool, reader_key)
 
-    messages = pagination.paginate_first_last(pool.messages, first, last)
-    logger.info(f"Read some messages from pool {pool}.")
+    pool_version = pool_etag(pool)
+    if etag.matches(if_none_match, pool_version):
+        return etag.not_modified(pool_version)
+    response.headers["ETag"] = pool_version
+    total, messages, has_more = await read_messages(
+        pool, first, last, allow_stale=True, since=since, until=until
+    )
+    log.info_sampled(
+        "Read {count} messages from pool {address}.", address=pool.address, count=len(messages)
+    )
     return models.response.ResponseMessages(
         encrypted=pool.encrypted,
-        total=len(pool.messages),
+        total=total,
         count=len(messages),
+        has_more=has_more,
         messages=messages,
     )
+
+
+async def search_messages(
+    pool: models.database.Pool, terms: list[str], limit: int, before_id: int | None
+) -> list:
+    if pool.ephemeral:
+        buffer = ephemeral.get_buffer(pool)
+        records = buffer.first(len(buffer))[::-1]
+        if before_id is not None:
+            records = [record for record in records if record.id < before_id]
+        # whole words, as the text indexes of the storages match them
+        words = {term.casefold() for term in terms}
+        found = [
+            record for record in records if words <= set(re.findall(r"\w+", record.plaintext.casefold()))
+        ]
+        return found[:limit]
+    return await storage.search_messages(pool, terms, limit, before_id, allow_stale=True)
+
+
+@router.get(
+    "/{identifier}/search",
+    response_model=models.response.ResponseFoundMessages,
+    summary="Search messages in pool",
+    description="Returns plaintext messages containing all words of `query`, newest first. "
+    "Pass `next_before_id` of the response as `before_id` to get the next page. "
+    "Encrypted pools can not be searched.",
+    responses=util.generate_responses(
+        "Returns list of found messages.",
+        [
+            exceptions.PoolDoesNotExistException,
+            exceptions.AccessDeniedException,
+            exceptions.ConflictException,
+        ],
+    ),
+)
+async def search_pool(
+    identifier: str,
+    query: str,
+    limit: int = 20,
+    before_id: int | None = None,
+    reader_key: str | None = None,
+):
+    if limit <= 0:
+        raise exceptions.UnprocessableEntityException("`limit` must be more than 0.")
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        raise exceptions.UnprocessableEntityException("`query` must contain at least one word.")
+    pool = await storage.get_pool(identifier, allow_stale=True, with_messages=False)
+    if not pool:
+        raise exceptions.PoolDoesNotExistException()
+    util.verify_reader_key(pool, reader_key)
+    if pool.encrypted:
+        raise exceptions.ConflictException("Encrypted pools can not be searched.")
+
+    messages = await search_messages(pool, terms, limit, before_id)
+    log.info_sampled(
+        "Found {count} messages in pool {address}.", address=pool.address, count=len(messages)
+    )
+    return models.response.ResponseFoundMessages(
+        count=len(messages),
+        messages=[
+            models.response.ResponsePlaintextMessage.from_db_model(message) for message in messages
+        ],
+        next_before_id=messages[-1].id if len(messages) == limit else None,
+    )
+
+
+@router.get(
+    "/{identifier}/poll",
+    response_model=models.response.ResponseMessages,
+    summary="Wait for new messages in pool",
+    description="Returns messages with id greater than `after_id`, waits up to `timeout` seconds if there are none.",
+    responses=util.generate_responses(
+        "Returns list of new messages from the requested pool (may be empty on timeout).",
+        [exceptions.PoolDoesNotExistException, exceptions.AccessDeniedException],
+    ),
+)
+async def poll_pool(
+    identifier: str,
+    after_id: int,
+    limit: int = 100,
+    timeout: int = 30,
+    reader_key: str | None = None,
+):
+    if limit <= 0:
+        raise exceptions.UnprocessableEntityException("`limit` must be more than 0.")
+    if after_id < 0:
+        raise exceptions.UnprocessableEntityException("`after_id` must be more than 0 or equal to it.")
+    pool = await storage.get_pool(identifier, with_messages=False)
+    if not pool:
+        raise exceptions.PoolDoesNotExistException()
+    util.verify_reader_key(pool, reader_key)
+
+    # subscribe before reading, so a message written in between is not missed
+    address = pool.address
+    future = fanout.subscribe(address)
+    try:
+        total, messages, has_more = await read_messages(pool, first=limit, after_id=after_id)
+        if not messages and await fanout.wait(
+            future, address, min(timeout, config.POLL_MAX_TIMEOUT_SEC)
+        ):
+            pool = await storage.get_pool(address, with_messages=False)
+            if not pool:
+                raise exceptions.PoolDoesNotExistException()
+            total, messages, has_more = await read_messages(pool, first=limit, after_id=after_id)
+    finally:
+        fanout.unsubscribe(address, future)
+    return models.response.ResponseMessages(
+        encrypted=pool.encrypted,
+        total=total,
+        count=len(messages),
+        has_more=has_more,
+        messages=messages,
+    )
+
+
+def parse_import_line(
+    pool: models.database.Pool, line_number: int, line: bytes
+) -> models.request.RequestImportMessage:
+    try:
+        message = models.request.RequestImportMessage.parse_raw(line)
+    except ValidationError as exc:
+        raise exceptions.UnprocessableEntityException(
+            util.build_errors_message(
+                f"Line {line_number}: invalid message",
+                [f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in exc.errors()],
+            )
+        )
+    errors = message.validate_based_on_type(message.type)
+    if errors:
+        raise exceptions.UnprocessableEntityException(
+            util.build_errors_message(f"Line {line_number}: invalid message fields", errors)
+        )
+    if pool.encrypted != (message.type == MessageType.encrypted):
+        raise exceptions.ConflictException(
+            f"Line {line_number}: pool encryption settings does not match with the message type."
+        )
+    return message
+
+
+def to_ndjson(messages: list) -> bytes:
+    return "".join(f"{util.build_response_message(message).json()}\n" for message in messages).encode()
+
+
+async def iter_export_chunks(pool: models.database.Pool, after_id: int) -> AsyncIterator[bytes]:
+    if pool.ephemeral:
+        buffer = ephemeral.get_buffer(pool)
+        yield to_ndjson(buffer.first(buffer.capacity, after_id))
+        return
+    async for batch in storage.iter_messages(pool, after_id, config.STREAM_BATCH_SIZE):
+        yield to_ndjson(batch)
+
+
+@router.get(
+    "/{identifier}/export",
+    response_class=StreamingResponse,
+    summary="Export pool messages",
+    description="Streams messages with id greater than `after_id` as NDJSON (one message object per line). "
+    "Pass id of the last received message as `after_id` to resume an interrupted export.",
+    responses=util.generate_responses(
+        "Returns NDJSON stream of message objects.",
+        [exceptions.PoolDoesNotExistException, exceptions.AccessDeniedException],
+    ),
+)
+async def export_pool(identifier: str, after_id: int = 0, reader_key: str | None = None):
+    if after_id < 0:
+        raise exceptions.UnprocessableEntityException("`after_id` must be more than 0 or equal to it.")
+    pool = await storage.get_pool(identifier, allow_stale=True, with_messages=False)
+    if not pool:
+        raise exceptions.PoolDoesNotExistException()
+    util.verify_reader_key(pool, reader_key)
+    logger.info(
+        "Exporting pool {address} after message {after_id}.", address=pool.address, after_id=after_id
+    )
+    return StreamingResponse(iter_export_chunks(pool, after_id), media_type="application/x-ndjson")
+
+
+@router.post(
+    "/{identifier}/import",
+    response_model=models.response.ResponseImportedMessages,
+    summary="Import messages to pool",
+    description="Appends messages from NDJSON request body (the format of pool export) to pool. "
+    "Message ids are reassigned, dates are kept, signatures are not imported. "
+    "Messages are written in batches: on error, messages preceding the invalid line may be already imported.",
+    responses=util.generate_responses(
+        "Returns count of imported messages and id of the last one.",
+        [
+            exceptions.PoolDoesNotExistException,
+            exceptions.AccessDeniedException,
+            exceptions.ConflictException,
+        ],
+    ),
+    openapi_extra={
+        "requestBody": {
+            "content": {"application/x-ndjson": {"schema": {"type": "string"}}},
+            "required": True,
+        }
+    },
+)
+async def import_pool(identifier: str, master_key: str, request: Request):
+    pool = await storage.get_pool(identifier, with_messages=False)
+    if not pool:
+        raise exceptions.PoolDoesNotExistException()
+    if not auth.verify_key(master_key, pool.master_key_hash):
+        raise exceptions.InvalidMasterKeyException()
+    if pool.ephemeral:
+        raise exceptions.ConflictException("Messages can not be imported to an ephemeral pool.")
+
+    count = 0
+    last_message_id = None
+    batch: list[NewMessage] = []
+
+    async def flush():
+        nonlocal count, last_message_id
+        if batch:
+            db_messages = await storage.write_messages(pool, batch)
+            count += len(db_messages)
+            last_message_id = db_messages[-1].id
+            fanout.publish(pool.address, last_message_id)
+            directory.update_counters(pool)
+            batch.clear()
+
+    try:
+        async for line_number, line in iter_lines(request):
+            message = parse_import_line(pool, line_number, line)
+            batch.append(NewMessage(message.type, message, None, util.to_local_naive(message.date)))
+            if len(batch) >= config.STREAM_BATCH_SIZE:
+                await flush()
+        await flush()
+    finally:
+        logger.info("Imported {count} messages to pool {address}.", address=pool.address, count=count)
+    return models.response.ResponseImportedMessages(count=count, last_message_id=last_message_id)
@@ -1,7 +1,10 @@
+from datetime import datetime
+
 from fastapi import APIRouter
 from loguru import logger
 
-from node import auth, crud, exceptions, models, util
+from node import auth, exceptions, log, models, pagination, util
+from node.storage import storage
 
 router = APIRouter(prefix="/signature")
 
@@ -15,8 +18,8 @@ router = APIRouter(prefix="/signature")
 )
 async def create_signature(signature: models.request.RequestNewSignature):
     db_signature = models.database.Signature.from_request(signature)
-    await db_signature.create()
-    logger.info(f"Created new signature: {db_signature}.")
+    await storage.create_signature(db_signature)
+    logger.info("Created new signature {uuid}.", uuid=db_signature.uuid)
     return models.response.ResponseSignature.from_db_model(db_signature)
 
 
@@ -26,23 +29,32 @@ async def create_signature(signature: models.request.RequestNewSignature):
     summary="Update signature",
     description="Updates some signature fields.",
     responses=util.generate_responses(
-        "Returns updated signature object.", api_exceptions=[exceptions.AccessDeniedException]
+        "Returns updated signature object.",
+        api_exceptions=[exceptions.AccessDeniedException, exceptions.StaleRevisionException],
     ),
 )
 async def update_signature(uuid: str, key: str, signature_data: models.request.RequestUpdateSignature):
-    signature = await crud.get_signature(uuid)
+    signature = await storage.get_signature(uuid)
     if not signature:
         raise exceptions.SignatureNotFoundException()
     if not auth.verify_key(key, signature.key_hash):
         raise exceptions.AccessDeniedException("Invalid key.")
+    if signature_data.revision is not None and signature_data.revision != signature.revision:
+        raise exceptions.StaleRevisionException()
+
+    fields = {}
     if signature_data.new_description:
-        signature.description = signature_data.new_description
+        fields["description"] = signature_data.new_description
     if signature_data.new_value:
-        signature.value = signature_data.new_value
+        fields["value"] = signature_data.new_value
     if signature_data.new_key:
-        signature.key_hash = auth.hash_key(signature_data.new_key)
-    await signature.save()
-    logger.info(f"Updated signature {signature}")
+        fields["key_hash"] = auth.hash_key(signature_data.new_key)
+    if not await storage.update_signature(signature, fields):
+        raise exceptions.StaleRevisionException()
+    for field, value in fields.items():
+        setattr(signature, field, value)
+    signature.revision += 1
+    logger.info("Updated signature {uuid}.", uuid=signature.uuid)
     return models.response.ResponseSignature.from_db_model(signature)
 
 
@@ -56,7 +68,53 @@ async def update_signature(uuid: str, key: str, signature_data: models.request.R
     ),
 )
 async def get_signature(uuid: str):
-    signature = await crud.get_signature(uuid)
+    signature = await storage.get_signature(uuid, allow_stale=True)
     if not signature:
         raise exceptions.SignatureNotFoundException()
     return models.response.ResponseSignature.from_db_model(signature)
+
+
+@router.get(
+    "/{uuid}/messages",
+    response_model=models.response.ResponseSignatureMessages,
+    summary="Get messages signed with signature",
+    description="Returns messages of public pools signed with the signature, newest first. "
+    "Pass `next_cursor` of the response as `cursor` to get the next page.",
+    responses=util.generate_responses(
+        "Returns list of messages with addresses of their pools.",
+        api_exceptions=[exceptions.SignatureNotFoundException],
+    ),
+)
+async def get_signature_messages(uuid: str, limit: int = 20, cursor: str | None = None):
+    if limit <= 0:
+        raise exceptions.UnprocessableEntityException("`limit` must be more than 0.")
+    before = None
+    if cursor:
+        try:
+            date, address, message_id = pagination.decode_cursor(cursor)
+            before = datetime.fromisoformat(date), str(address), int(message_id)
+        except (TypeError, ValueError):
+            raise exceptions.UnprocessableEntityException("Invalid `cursor`.")
+    signature = await storage.get_signature(uuid, allow_stale=True)
+    if not signature:
+        raise exceptions.SignatureNotFoundException()
+
+    found = await storage.get_signature_messages(uuid, limit, before, allow_stale=True)
+    log.info_sampled("Found {count} messages of signature {uuid}.", uuid=uuid, count=len(found))
+    last = found[-1] if len(found) == limit else None
+    return models.response.ResponseSignatureMessages(
+        count=len(found),
+        messages=[
+            models.response.ResponseSignatureMessage(
+                pool_address=item.pool_address,
+                pool_tag=item.pool_tag,
+                message=util.build_response_message(item.message),
+            )
+            for item in found
+        ],
+        next_cursor=pagination.encode_cursor(
+            last.message.date.isoformat(), last.pool_address, last.message.id
+        )
+        if last
+        else None,
+    )
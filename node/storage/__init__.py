@@ -0,0 +1,19 @@
+from node.config import config
+from node.storage.base import Storage
+
+
+def create_storage() -> Storage:
+    match config.STORAGE_BACKEND:
+        case "mongo":
+            from node.storage.mongo import MongoStorage
+
+            return MongoStorage()
+        case "sqlite":
+            from node.storage.sqlite import SQLiteStorage
+
+            return SQLiteStorage()
+        case _:
+            raise ValueError(f"Unknown storage backend: {config.STORAGE_BACKEND}.")
+
+
+storage = create_storage()
@@ -0,0 +1,201 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, AsyncIterator, NamedTuple
+
+from node.enums import MessageType
+from node.models import database, request
+
+
+def build_message(
+    message_type: MessageType,
+    id: int,  # noqa
+    date: datetime,
+    signature: database.Signature | None,
+    message: request.RequestNewMessage,
+) -> database.PlaintextMessage | database.EncryptedMessage:
+    match message_type:
+        case MessageType.plaintext:
+            return database.PlaintextMessage(
+                type=message_type, id=id, date=date, signature=signature, plaintext=message.plaintext
+            )
+        case MessageType.encrypted:
+            return database.EncryptedMessage(
+                type=message_type,
+                id=id,
+                date=date,
+                signature=signature,
+                AES_ciphertext=message.AES_ciphertext,
+                AES_nonce=message.AES_nonce,
+                AES_tag=message.AES_tag,
+            )
+        case _:
+            raise ValueError("Invalid message type.")
+
+
+class NewMessage(NamedTuple):
+    type: MessageType
+    message: request.RequestNewMessage
+    signature: database.Signature | None
+    date: datetime
+
+
+class SignatureMessage(NamedTuple):
+    pool_address: str
+    pool_tag: str | None
+    message: database.PlaintextMessage | database.EncryptedMessage
+
+
+class IdempotencyRecord(NamedTuple):
+    fingerprint: str
+    response: bytes | None  # `None` while the request is being processed
+
+
+class PoolTotals(NamedTuple):
+    pools_count: int
+    messages_count: int
+    stored_bytes: int
+
+
+class Storage(ABC):
+    """Persistence interface used by routers. Implementations: `MongoStorage`, `SQLiteStorage`."""
+
+    @abstractmethod
+    async def connect(self):
+        ...
+
+    @abstractmethod
+    async def close(self):
+        ...
+
+    # pools
+    # `allow_stale` is passed by read-only routes: the result may lag behind recent writes (bounded staleness)
+    @abstractmethod
+    async def get_pool(
+        self, identifier: str, allow_stale: bool = False, with_messages: bool = True
+    ) -> database.Pool | None:
+        """
+        Returns pool by its address or tag.
+        If `with_messages` is false, `pool.messages` may be left empty (use `read_messages`, `iter_messages`).
+        """
+
+    @abstractmethod
+    async def get_public_pools(self, allow_stale: bool = False) -> list[database.Pool]:
+        """Returns public pools without messages."""
+
+    @abstractmethod
+    async def get_pool_totals(self, allow_stale: bool = False) -> PoolTotals:
+        """Sums activity counters of all pools (messages are not scanned)."""
+
+    @abstractmethod
+    async def create_pool(self, pool: database.Pool):
+        ...
+
+    @abstractmethod
+    async def update_pool(self, pool: database.Pool, fields: dict[str, Any]) -> bool:
+        """
+        Sets mutable pool fields (description, key hashes) and increments revision,
+        if the stored revision is still `pool.revision`. Returns `False` otherwise.
+        """
+
+    @abstractmethod
+    async def delete_pool(self, pool: database.Pool):
+        ...
+
+    # messages
+    @abstractmethod
+    async def read_messages(
+        self,
+        pool: database.Pool,
+        first: int | None = None,
+        last: int | None = None,
+        after_id: int | None = None,
+        allow_stale: bool = False,
+        since: datetime | None = None,
+        until: datetime | None = None,
+    ) -> tuple[int, list[database.PlaintextMessage | database.EncryptedMessage]]:
+        """
+        Returns total count of pool messages and the requested page of them.
+        If `after_id` is specified, only messages with greater ids are paginated.
+        If `since` or `until` is specified, only messages with `since <= date < until` are paginated,
+        ordered by date.
+        """
+
+    @abstractmethod
+    def iter_messages(
+        self, pool: database.Pool, after_id: int = 0, batch_size: int = 500
+    ) -> AsyncIterator[list[database.PlaintextMessage | database.EncryptedMessage]]:
+        """Yields batches of messages with id greater than `after_id`, fetching one batch at a time."""
+
+    @abstractmethod
+    async def write_messages(
+        self, pool: database.Pool, messages: list[NewMessage], after_id: int | None = None
+    ) -> list[database.PlaintextMessage | database.EncryptedMessage]:
+        """
+        Assigns consecutive ids to the messages and persists them in one operation.
+        Does not require `pool.messages` to be loaded. Activity counters of the pool are updated
+        in the same operation, the passed pool object gets their new values.
+        Raises `PoolDoesNotExistException` if the pool was deleted, nothing is written then.
+        If `after_id` is specified, the messages are written only if the last message of the pool
+        has this id, `MessageIdConflictException` is raised otherwise.
+        """
+
+    @abstractmethod
+    async def search_messages(
+        self,
+        pool: database.Pool,
+        terms: list[str],
+        limit: int,
+        before_id: int | None = None,
+        allow_stale: bool = False,
+    ) -> list[database.PlaintextMessage]:
+        """Returns plaintext messages containing all the terms (case-insensitive), newest first."""
+
+    # signatures
+    @abstractmethod
+    async def get_signature(self, uuid: str, allow_stale: bool = False) -> database.Signature | None:
+        ...
+
+    @abstractmethod
+    async def get_signature_messages(
+        self,
+        uuid: str,
+        limit: int,
+        before: tuple[datetime, str, int] | None = None,
+        allow_stale: bool = False,
+    ) -> list[SignatureMessage]:
+        """
+        Returns messages of public pools signed with the signature,
+        ordered by (date, pool address, message id) descending, starting before `before`.
+        """
+
+    @abstractmethod
+    async def count_signatures(self, allow_stale: bool = False) -> int:
+        ...
+
+    @abstractmethod
+    async def create_signature(self, signature: database.Signature):
+        ...
+
+    @abstractmethod
+    async def update_signature(self, signature: database.Signature, fields: dict[str, Any]) -> bool:
+        """
+        Sets mutable signature fields (value, description, key hash) and increments revision,
+        if the stored revision is still `signature.revision`. Returns `False` otherwise.
+        """
+
+    # idempotency keys (see `node.idempotency`)
+    @abstractmethod
+    async def reserve_idempotency_key(
+        self, key: str, route: str, pool: str, fingerprint: str, expires_at: datetime
+    ) -> IdempotencyRecord | None:
+        """Saves pending record of the key and returns `None`, or returns unexpired existing record."""
+
+    @abstractmethod
+    async def complete_idempotency_key(
+        self, key: str, route: str, pool: str, response: bytes, expires_at: datetime
+    ):
+        ...
+
+    @abstractmethod
+    async def release_idempotency_key(self, key: str, route: str, pool: str):
+        ...
@@ -0,0 +1,576 @@
+from datetime import datetime
+from typing import Any, AsyncIterator
+
+from beanie import Link, init_beanie
+from beanie.odm.utils.encoder import Encoder
+from beanie.odm.utils.parsing import parse_obj
+from motor import motor_asyncio
+from pydantic import parse_obj_as
+from pymongo import ASCENDING, DESCENDING, TEXT, ReturnDocument, read_preferences
+from pymongo.errors import DuplicateKeyError
+
+from node import exceptions
+from node.config import config
+from node.enums import MessageType
+from node.models import database
+from node.storage.base import (
+    IdempotencyRecord,
+    NewMessage,
+    PoolTotals,
+    SignatureMessage,
+    Storage,
+    build_message,
+)
+
+READ_PREFERENCES = {
+    "primary": read_preferences.Primary,
+    "primaryPreferred": read_preferences.PrimaryPreferred,
+    "secondary": read_preferences.Secondary,
+    "secondaryPreferred": read_preferences.SecondaryPreferred,
+    "nearest": read_preferences.Nearest,
+}
+
+
+def build_client() -> motor_asyncio.AsyncIOMotorClient:
+    write_concern = config.MONGO_WRITE_CONCERN
+    return motor_asyncio.AsyncIOMotorClient(
+        f"mongodb://{config.MONGO_HOST}:{config.MONGO_PORT}/{config.MONGO_DB}",
+        replicaset=config.MONGO_REPLICA_SET,
+        maxPoolSize=config.MONGO_MAX_POOL_SIZE,
+        minPoolSize=config.MONGO_MIN_POOL_SIZE,
+        connectTimeoutMS=config.MONGO_CONNECT_TIMEOUT_MS,
+        socketTimeoutMS=config.MONGO_SOCKET_TIMEOUT_MS or None,
+        serverSelectionTimeoutMS=config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        w=int(write_concern) if write_concern.isdigit() else write_concern,
+        wTimeoutMS=config.MONGO_WRITE_TIMEOUT_MS,
+    )
+
+
+def build_stale_read_preference() -> read_preferences._ServerMode:
+    if config.MONGO_READ_PREFERENCE not in READ_PREFERENCES:
+        raise ValueError(f"Unknown MongoDB read preference: {config.MONGO_READ_PREFERENCE}.")
+    if config.MONGO_READ_PREFERENCE == "primary":
+        return read_preferences.Primary()
+    return READ_PREFERENCES[config.MONGO_READ_PREFERENCE](max_staleness=config.MONGO_MAX_STALENESS_SEC)
+
+
+# messages are embedded into pools, so they are also indexed as separate documents:
+# {pool, id, date, signature (uuid), public, plaintext (plaintext messages only)}
+MESSAGE_INDEX_COLLECTION = "message_index"
+MESSAGE_INDEX_VERSION = 2  # increment when fields are added, existing entries are then backfilled
+MIGRATIONS_COLLECTION = "migrations"
+IDEMPOTENCY_KEYS_COLLECTION = "idempotency_keys"
+
+MESSAGE_INDEX_BACKFILL_PIPELINE = [
+    {"$match": {"ephemeral": {"$ne": True}}},
+    {"$unwind": "$messages"},
+    {
+        "$project": {
+            "_id": 0,
+            "pool": "$address",
+            "id": "$messages.id",
+            "date": "$messages.date",
+            "signature": "$messages.signature.uuid",
+            "public": "$public",
+            "plaintext": "$messages.plaintext",
+        }
+    },
+    {"$merge": {"into": MESSAGE_INDEX_COLLECTION, "on": ["pool", "id"], "whenMatched": "merge"}},
+]
+
+
+# sets activity counters of pools created before they were introduced
+POOL_COUNTERS_BACKFILL_PIPELINE = [
+    {
+        "$set": {
+            "message_count": {"$size": "$messages"},
+            "last_message_id": {"$size": "$messages"},
+            "last_message_at": {"$max": "$messages.date"},
+            "stored_bytes": {
+                "$sum": {
+                    "$map": {
+                        "input": "$messages",
+                        "in": {
+                            "$add": [
+                                {"$strLenBytes": {"$ifNull": ["$$this.plaintext", ""]}},
+                                {"$binarySize": {"$ifNull": ["$$this.AES_ciphertext", ""]}},
+                                {"$binarySize": {"$ifNull": ["$$this.AES_nonce", ""]}},
+                                {"$binarySize": {"$ifNull": ["$$this.AES_tag", ""]}},
+                            ]
+                        },
+                    }
+                }
+            },
+        }
+    }
+]
+POOL_COUNTERS_FIELDS = {"_id": 0, "message_count": 1, "last_message_at": 1, "stored_bytes": 1}
+
+
+def build_index_entry(
+    pool: database.Pool, message: database.PlaintextMessage | database.EncryptedMessage
+) -> dict[str, Any]:
+    entry = {
+        "pool": pool.address,
+        "id": message.id,
+        "date": message.date,
+        "signature": message.signature.uuid if message.signature else None,
+        "public": pool.public,
+    }
+    if message.type == MessageType.plaintext:
+        entry["plaintext"] = message.plaintext
+    return entry
+
+
+def match_revision(revision: int) -> int | dict[str, Any]:
+    # documents created before revisions were introduced do not have the field
+    return revision or {"$in": [0, None]}
+
+
+def revision_update(fields: dict[str, Any]) -> dict[str, Any]:
+    update: dict[str, Any] = {"$inc": {"revision": 1}}
+    if fields:  # empty `$set` is rejected by MongoDB
+        update["$set"] = fields
+    return update
+
+
+class MongoStorage(Storage):
+    def __init__(self):
+        self.client: motor_asyncio.AsyncIOMotorClient | None = None
+        # collections used by read-only routes, may read from secondaries
+        self.stale_pools: motor_asyncio.AsyncIOMotorCollection | None = None
+        self.stale_signatures: motor_asyncio.AsyncIOMotorCollection | None = None
+        self.message_index: motor_asyncio.AsyncIOMotorCollection | None = None
+        self.stale_message_index: motor_asyncio.AsyncIOMotorCollection | None = None
+        self.idempotency_keys: motor_asyncio.AsyncIOMotorCollection | None = None
+
+    async def connect(self):
+        self.client = build_client()
+        await init_beanie(
+            self.client[config.MONGO_DB], document_models=[database.Pool, database.Signature]
+        )
+        read_preference = build_stale_read_preference()
+        self.stale_pools = database.Pool.get_motor_collection().with_options(
+            read_preference=read_preference
+        )
+        self.stale_signatures = database.Signature.get_motor_collection().with_options(
+            read_preference=read_preference
+        )
+        self.message_index = self.client[config.MONGO_DB][MESSAGE_INDEX_COLLECTION]
+        self.stale_message_index = self.message_index.with_options(read_preference=read_preference)
+        await self.message_index.create_index([("pool", ASCENDING), ("id", ASCENDING)], unique=True)
+        await self.message_index.create_index(
+            [("pool", ASCENDING), ("date", ASCENDING), ("id", ASCENDING)]
+        )
+        await self.message_index.create_index([("pool", ASCENDING), ("plaintext", TEXT)])
+        await self.message_index.create_index(
+            [
+                ("signature", ASCENDING),
+                ("public", ASCENDING),
+                ("date", DESCENDING),
+                ("pool", DESCENDING),
+                ("id", DESCENDING),
+            ]
+        )
+        await self._backfill_message_index()
+        await database.Pool.get_motor_collection().update_many(
+            {"message_count": {"$exists": False}}, POOL_COUNTERS_BACKFILL_PIPELINE
+        )
+        self.idempotency_keys = self.client[config.MONGO_DB][IDEMPOTENCY_KEYS_COLLECTION]
+        await self.idempotency_keys.create_index(
+            [("key", ASCENDING), ("route", ASCENDING), ("pool", ASCENDING)], unique=True
+        )
+        await self.idempotency_keys.create_index("expires_at", expireAfterSeconds=0)
+
+    async def _backfill_message_index(self):
+        """Indexes messages written before the index (or its latest fields) was introduced."""
+        migrations = self.client[config.MONGO_DB][MIGRATIONS_COLLECTION]
+        migration = await migrations.find_one({"_id": MESSAGE_INDEX_COLLECTION})
+        if migration and migration["version"] >= MESSAGE_INDEX_VERSION:
+            return
+        await database.Pool.get_motor_collection().aggregate(MESSAGE_INDEX_BACKFILL_PIPELINE).to_list(
+            None
+        )
+        await migrations.update_one(
+            {"_id": MESSAGE_INDEX_COLLECTION},
+            {"$set": {"version": MESSAGE_INDEX_VERSION}},
+            upsert=True,
+        )
+
+    async def close(self):
+        self.client.close()
+
+    async def _resolve_signature_links(
+        self,
+        pools: list[database.Pool],
+        messages: list[database.Message] | None = None,
+        allow_stale: bool = False,
+    ):
+        """Replaces signature links of pools and messages with signatures (as `fetch_links` does)."""
+        messages = (messages or []) + [message for pool in pools for message in pool.messages]
+        links = [pool.creator_signature for pool in pools] + [message.signature for message in messages]
+        ids = {link.ref.id for link in links if isinstance(link, Link)}
+        if not ids:
+            return
+        collection = self.stale_signatures if allow_stale else database.Signature.get_motor_collection()
+        cursor = collection.find({"_id": {"$in": list(ids)}})
+        signatures = {
+            document["_id"]: parse_obj(database.Signature, document) async for document in cursor
+        }
+
+        def resolve(link: Any) -> Any:
+            return signatures.get(link.ref.id, link) if isinstance(link, Link) else link
+
+        for pool in pools:
+            pool.creator_signature = resolve(pool.creator_signature)
+        for message in messages:
+            message.signature = resolve(message.signature)
+
+    async def _find_pools(
+        self, query: dict[str, Any], allow_stale: bool, with_messages: bool
+    ) -> list[database.Pool]:
+        collection = self.stale_pools if allow_stale else database.Pool.get_motor_collection()
+        cursor = collection.find(query, None if with_messages else {"messages": 0})
+        pools = [parse_obj(database.Pool, document) async for document in cursor]
+        await self._resolve_signature_links(pools, allow_stale=allow_stale)
+        return pools
+
+    async def get_pool(
+        self, identifier: str, allow_stale: bool = False, with_messages: bool = True
+    ) -> database.Pool | None:
+        if allow_stale or not with_messages:
+            pools = await self._find_pools(
+                {"$or": [{"address": identifier}, {"tag": identifier}]}, allow_stale, with_messages
+            )
+            return min(pools, key=lambda pool: pool.address != identifier, default=None)
+        return (await database.Pool.find_one(database.Pool.address == identifier, fetch_links=True)) or (
+            await database.Pool.find_one(database.Pool.tag == identifier, fetch_links=True)
+        )
+
+    async def get_public_pools(self, allow_stale: bool = False) -> list[database.Pool]:
+        return await self._find_pools({"public": True}, allow_stale, with_messages=False)
+
+    async def get_pool_totals(self, allow_stale: bool = False) -> PoolTotals:
+        collection = self.stale_pools if allow_stale else database.Pool.get_motor_collection()
+        documents = await collection.aggregate(
+            [
+                {
+                    "$group": {
+                        "_id": None,
+                        "pools_count": {"$sum": 1},
+                        "messages_count": {"$sum": "$message_count"},
+                        "stored_bytes": {"$sum": "$stored_bytes"},
+                    }
+                },
+                {"$project": {"_id": 0}},
+            ]
+        ).to_list(length=1)
+        return PoolTotals(**documents[0]) if documents else PoolTotals(0, 0, 0)
+
+    async def create_pool(self, pool: database.Pool):
+        await pool.save()
+
+    async def update_pool(self, pool: database.Pool, fields: dict[str, Any]) -> bool:
+        # do not rewrite the whole document: messages may be appended concurrently
+        result = await database.Pool.get_motor_collection().update_one(
+            {"_id": pool.id, "revision": match_revision(pool.revision)},
+            revision_update(fields),
+        )
+        return bool(result.matched_count)
+
+    async def delete_pool(self, pool: database.Pool):
+        await pool.delete()
+        await self.message_index.delete_many({"pool": pool.address})
+
+    async def read_messages(
+        self,
+        pool: database.Pool,
+        first: int | None = None,
+        last: int | None = None,
+        after_id: int | None = None,
+        allow_stale: bool = False,
+        since: datetime | None = None,
+        until: datetime | None = None,
+    ) -> tuple[int, list[database.PlaintextMessage | database.EncryptedMessage]]:
+        if not first and not last:
+            raise ValueError()
+        after_id = after_id or 0
+        if since or until:
+            return await self._read_messages_by_date(
+                pool, first, last, after_id, allow_stale, since, until
+            )
+        total = {"$size": "$messages"}
+        if first:
+            position, count = after_id, first
+        else:
+            position, count = {"$max": [after_id, {"$subtract": [total, last]}]}, last
+        # ids are 1, 2, 3..., so the page is sliced on the server and the pool may be loaded without messages
+        collection = self.stale_pools if allow_stale else database.Pool.get_motor_collection()
+        documents = await collection.aggregate(
+            [
+                {"$match": {"_id": pool.id}},
+                {
+                    "$project": {
+                        "_id": 0,
+                        "total": total,
+                        "messages": {"$slice": ["$messages", position, count]},
+                    }
+                },
+            ]
+        ).to_list(length=1)
+        if not documents:
+            return 0, []
+        return documents[0]["total"], await self._parse_messages(documents[0]["messages"], allow_stale)
+
+    async def _read_messages_by_date(
+        self,
+        pool: database.Pool,
+        first: int | None,
+        last: int | None,
+        after_id: int,
+        allow_stale: bool,
+        since: datetime | None,
+        until: datetime | None,
+    ) -> tuple[int, list[database.PlaintextMessage | database.EncryptedMessage]]:
+        query = {"pool": pool.address, "id": {"$gt": after_id}, "date": {}}
+        if since:
+            query["date"]["$gte"] = since
+        if until:
+            query["date"]["$lt"] = until
+        order = ASCENDING if first else DESCENDING
+        message_index = self.stale_message_index if allow_stale else self.message_index
+        cursor = (
+            message_index.find(query, {"_id": 0, "id": 1})
+            .sort([("date", order), ("id", order)])
+            .limit(first or last)
+        )
+        ids = [document["id"] async for document in cursor]
+        total, messages = await self._get_messages_by_ids(pool, ids, allow_stale)
+        return total, sorted(messages, key=lambda message: (message.date, message.id))
+
+    async def _get_messages_by_ids(
+        self, pool: database.Pool, ids: list[int], allow_stale: bool
+    ) -> tuple[int, list[database.PlaintextMessage | database.EncryptedMessage]]:
+        """Returns total count of pool messages and messages with the ids (in any order)."""
+        collection = self.stale_pools if allow_stale else database.Pool.get_motor_collection()
+        documents = await collection.aggregate(
+            [
+                {"$match": {"_id": pool.id}},
+                {
+                    "$project": {
+                        "_id": 0,
+                        "total": {"$size": "$messages"},
+                        "messages": {
+                            "$filter": {"input": "$messages", "cond": {"$in": ["$$this.id", ids]}}
+                        },
+                    }
+                },
+            ]
+        ).to_list(length=1)
+        if not documents:
+            return 0, []
+        return documents[0]["total"], await self._parse_messages(documents[0]["messages"], allow_stale)
+
+    async def _parse_messages(
+        self, documents: list[dict[str, Any]], allow_stale: bool = False
+    ) -> list[database.PlaintextMessage | database.EncryptedMessage]:
+        messages = parse_obj_as(list[database.PlaintextMessage | database.EncryptedMessage], documents)
+        await self._resolve_signature_links([], messages, allow_stale)
+        return messages
+
+    async def iter_messages(
+        self, pool: database.Pool, after_id: int = 0, batch_size: int = 500
+    ) -> AsyncIterator[list[database.PlaintextMessage | database.EncryptedMessage]]:
+        collection = database.Pool.get_motor_collection()
+        while True:
+            # messages are embedded into the pool document, fetch only a slice of them
+            documents = await collection.aggregate(
+                [
+                    {"$match": {"_id": pool.id}},
+                    {
+                        "$project": {
+                            "_id": 0,
+                            "messages": {"$slice": ["$messages", after_id, batch_size]},
+                        }
+                    },
+                ]
+            ).to_list(length=1)
+            if not documents or not documents[0]["messages"]:
+                return
+            messages = await self._parse_messages(documents[0]["messages"])
+            yield messages
+            if len(messages) < batch_size:
+                return
+            after_id = messages[-1].id
+
+    async def write_messages(
+        self, pool: database.Pool, messages: list[NewMessage], after_id: int | None = None
+    ) -> list[database.PlaintextMessage | database.EncryptedMessage]:
+        collection = database.Pool.get_motor_collection()
+        while True:
+            # ids are positions in the messages array: append only if nobody has appended since counting
+            counts = await collection.aggregate(
+                [{"$match": {"_id": pool.id}}, {"$project": {"_id": 0, "count": {"$size": "$messages"}}}]
+            ).to_list(length=1)
+            count = counts[0]["count"] if counts else 0
+            if counts and after_id is not None and count != after_id:
+                raise exceptions.MessageIdConflictException()
+            db_messages = [
+                build_message(
+                    new_message.type,
+                    count + i,
+                    new_message.date,
+                    new_message.signature,
+                    new_message.message,
+                )
+                for i, new_message in enumerate(messages, start=1)
+            ]
+            # append instead of rewriting the whole pool document, counters are updated atomically with it
+            counters = await collection.find_one_and_update(
+                {"_id": pool.id, "messages": {"$size": count}},
+                {
+                    "$push": {"messages": {"$each": Encoder(to_db=True).encode(db_messages)}},
+                    "$inc": {
+                        "message_count": len(db_messages),
+                        "stored_bytes": sum(map(database.message_size, db_messages)),
+                    },
+                    "$max": {
+                        "last_message_id": db_messages[-1].id,
+                        "last_message_at": max(db_message.date for db_message in db_messages),
+                    },
+                },
+                projection=POOL_COUNTERS_FIELDS,
+                return_document=ReturnDocument.AFTER,
+            )
+            if not counts:  # the pool was deleted
+                raise exceptions.PoolDoesNotExistException()
+            if counters:
+                break
+        pool.last_message_id = db_messages[-1].id
+        pool.message_count = counters["message_count"]
+        pool.last_message_at = counters["last_message_at"]
+        pool.stored_bytes = counters["stored_bytes"]
+        await self.message_index.insert_many(
+            [build_index_entry(pool, db_message) for db_message in db_messages], ordered=False
+        )
+        return db_messages
+
+    async def search_messages(
+        self,
+        pool: database.Pool,
+        terms: list[str],
+        limit: int,
+        before_id: int | None = None,
+        allow_stale: bool = False,
+    ) -> list[database.PlaintextMessage]:
+        # every term is a phrase, so all of them must be present
+        query = {"pool": pool.address, "$text": {"$search": " ".join(f'"{term}"' for term in terms)}}
+        if before_id is not None:
+            query["id"] = {"$lt": before_id}
+        message_index = self.stale_message_index if allow_stale else self.message_index
+        cursor = message_index.find(query, {"_id": 0, "id": 1}).sort("id", DESCENDING).limit(limit)
+        ids = [document["id"] async for document in cursor]
+        if not ids:
+            return []
+        _, messages = await self._get_messages_by_ids(pool, ids, allow_stale)
+        return sorted(messages, key=lambda message: message.id, reverse=True)
+
+    async def get_signature_messages(
+        self,
+        uuid: str,
+        limit: int,
+        before: tuple[datetime, str, int] | None = None,
+        allow_stale: bool = False,
+    ) -> list[SignatureMessage]:
+        query = {"signature": uuid, "public": True}
+        if before:
+            date, address, id = before  # noqa
+            query["$or"] = [
+                {"date": {"$lt": date}},
+                {"date": date, "pool": {"$lt": address}},
+                {"date": date, "pool": address, "id": {"$lt": id}},
+            ]
+        message_index = self.stale_message_index if allow_stale else self.message_index
+        cursor = (
+            message_index.find(query, {"_id": 0, "pool": 1, "id": 1})
+            .sort([("date", DESCENDING), ("pool", DESCENDING), ("id", DESCENDING)])
+            .limit(limit)
+        )
+        entries = [(entry["pool"], entry["id"]) async for entry in cursor]
+        if not entries:
+            return []
+
+        # fetch only the found messages of the pools containing them
+        collection = self.stale_pools if allow_stale else database.Pool.get_motor_collection()
+        keys = [f"{address}:{id}" for address, id in entries]
+        message_key = {"$concat": ["$address", ":", {"$toString": "$$this.id"}]}
+        documents = await collection.aggregate(
+            [
+                {"$match": {"address": {"$in": list({address for address, _ in entries})}}},
+                {
+                    "$project": {
+                        "_id": 0,
+                        "address": 1,
+                        "tag": 1,
+                        "messages": {
+                            "$filter": {"input": "$messages", "cond": {"$in": [message_key, keys]}}
+                        },
+                    }
+                },
+            ]
+        ).to_list(None)
+        found = {}
+        for document in documents:
+            for message in await self._parse_messages(document["messages"], allow_stale):
+                found[document["address"], message.id] = SignatureMessage(
+                    document["address"], document.get("tag"), message
+                )
+        return [found[entry] for entry in entries if entry in found]
+
+    async def get_signature(self, uuid: str, allow_stale: bool = False) -> database.Signature | None:
+        if allow_stale:
+            document = await self.stale_signatures.find_one({"uuid": uuid})
+            return parse_obj(database.Signature, document) if document else None
+        return await database.Signature.find_one(database.Signature.uuid == uuid)
+
+    async def count_signatures(self, allow_stale: bool = False) -> int:
+        if allow_stale:
+            return await self.stale_signatures.count_documents({})
+        return await database.Signature.count()
+
+    async def create_signature(self, signature: database.Signature):
+        await signature.create()
+
+    async def update_signature(self, signature: database.Signature, fields: dict[str, Any]) -> bool:
+        result = await database.Signature.get_motor_collection().update_one(
+            {"_id": signature.id, "revision": match_revision(signature.revision)},
+            revision_update(fields),
+        )
+        return bool(result.matched_count)
+
+    async def reserve_idempotency_key(
+        self, key: str, route: str, pool: str, fingerprint: str, expires_at: datetime
+    ) -> IdempotencyRecord | None:
+        record_id = {"key": key, "route": route, "pool": pool}
+        record = {**record_id, "fingerprint": fingerprint, "response": None, "expires_at": expires_at}
+        try:
+            await self.idempotency_keys.insert_one(record)
+            return None
+        except DuplicateKeyError:
+            document = await self.idempotency_keys.find_one(record_id)
+        # expired records are removed by the TTL monitor with a delay
+        if document is None or document["expires_at"] < datetime.utcnow():
+            await self.idempotency_keys.replace_one(record_id, record, upsert=True)
+            return None
+        return IdempotencyRecord(document["fingerprint"], document["response"])
+
+    async def complete_idempotency_key(
+        self, key: str, route: str, pool: str, response: bytes, expires_at: datetime
+    ):
+        await self.idempotency_keys.update_one(
+            {"key": key, "route": route, "pool": pool},
+            {"$set": {"response": response, "expires_at": expires_at}},
+        )
+
+    async def release_idempotency_key(self, key: str, route: str, pool: str):
+        await self.idempotency_keys.delete_one({"key": key, "route": route, "pool": pool})
@@ -0,0 +1,591 @@
+import asyncio
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, TypeVar
+
+from node import exceptions
+from node.config import config
+from node.enums import MessageType
+from node.models import database
+from node.storage.base import (
+    IdempotencyRecord,
+    NewMessage,
+    PoolTotals,
+    SignatureMessage,
+    Storage,
+    build_message,
+)
+
+T = TypeVar("T")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signatures (
+    uuid TEXT PRIMARY KEY,
+    key_hash TEXT NOT NULL,
+    description TEXT,
+    value TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    revision INTEGER NOT NULL DEFAULT 0,
+    replica_of TEXT
+);
+
+CREATE TABLE IF NOT EXISTS pools (
+    address TEXT PRIMARY KEY,
+    uuid TEXT NOT NULL,
+    type TEXT NOT NULL,
+    tag TEXT UNIQUE,
+    description TEXT,
+    public INTEGER NOT NULL,
+    creator_signature TEXT REFERENCES signatures (uuid),
+    created_at TEXT NOT NULL,
+    master_key_hash TEXT NOT NULL,
+    writer_key_hash TEXT,
+    reader_key_hash TEXT,
+    encrypted INTEGER NOT NULL,
+    ephemeral INTEGER NOT NULL DEFAULT 0,
+    revision INTEGER NOT NULL DEFAULT 0,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    last_message_id INTEGER NOT NULL DEFAULT 0,
+    last_message_at TEXT,
+    stored_bytes INTEGER NOT NULL DEFAULT 0,
+    replica_of TEXT
+);
+CREATE INDEX IF NOT EXISTS pools_public ON pools (public, created_at);
+
+CREATE TABLE IF NOT EXISTS messages (
+    pool TEXT NOT NULL REFERENCES pools (address) ON DELETE CASCADE,
+    id INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    date TEXT NOT NULL,
+    signature TEXT REFERENCES signatures (uuid),
+    plaintext TEXT,
+    AES_ciphertext BLOB,
+    AES_nonce BLOB,
+    AES_tag BLOB,
+    PRIMARY KEY (pool, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS messages_date ON messages (pool, date);
+CREATE INDEX IF NOT EXISTS messages_signature ON messages (signature, date);
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT NOT NULL,
+    route TEXT NOT NULL,
+    pool TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    response BLOB,
+    expires_at TEXT NOT NULL,
+    PRIMARY KEY (key, route, pool)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idempotency_keys_expires_at ON idempotency_keys (expires_at);
+
+-- full-text index of plaintext messages, `pool` is indexed as a single token (pool address)
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(pool, plaintext, id UNINDEXED);
+"""
+
+# columns added to existing tables after their creation: (table, column, definition)
+MIGRATIONS = [
+    ("pools", "revision", "INTEGER NOT NULL DEFAULT 0"),
+    ("signatures", "revision", "INTEGER NOT NULL DEFAULT 0"),
+    ("pools", "message_count", "INTEGER NOT NULL DEFAULT 0"),
+    ("pools", "last_message_id", "INTEGER NOT NULL DEFAULT 0"),
+    ("pools", "last_message_at", "TEXT"),
+    ("pools", "stored_bytes", "INTEGER NOT NULL DEFAULT 0"),
+    ("pools", "replica_of", "TEXT"),
+    ("signatures", "replica_of", "TEXT"),
+]
+
+# size of message content in bytes, see `database.message_size`
+MESSAGE_SIZE = (
+    "COALESCE(LENGTH(CAST(plaintext AS BLOB)), 0) + COALESCE(LENGTH(AES_ciphertext), 0) "
+    "+ COALESCE(LENGTH(AES_nonce), 0) + COALESCE(LENGTH(AES_tag), 0)"
+)
+
+# columns which may be changed by `update_pool` and `update_signature`
+POOL_MUTABLE_COLUMNS = {"description", "master_key_hash", "writer_key_hash", "reader_key_hash"}
+SIGNATURE_MUTABLE_COLUMNS = {"description", "value", "key_hash"}
+
+SIGNATURE_COLUMNS = "s.uuid, s.key_hash, s.description, s.value, s.created_at, s.revision, s.replica_of"
+POOL_COLUMNS = (
+    "p.address, p.uuid, p.type, p.tag, p.description, p.public, p.created_at, p.master_key_hash, "
+    "p.writer_key_hash, p.reader_key_hash, p.encrypted, p.ephemeral, p.revision, "
+    "p.last_message_id, p.message_count, p.last_message_at, p.stored_bytes, p.replica_of"
+)
+MESSAGE_COLUMNS = "m.type, m.id, m.date, m.plaintext, m.AES_ciphertext, m.AES_nonce, m.AES_tag"
+
+SELECT_POOL = (
+    f"SELECT {POOL_COLUMNS}, {SIGNATURE_COLUMNS} FROM pools p "
+    "LEFT JOIN signatures s ON s.uuid = p.creator_signature"
+)
+SELECT_MESSAGES = (
+    f"SELECT {MESSAGE_COLUMNS}, {SIGNATURE_COLUMNS} FROM messages m "
+    "LEFT JOIN signatures s ON s.uuid = m.signature WHERE m.pool = ?"
+)
+
+
+def _signature_from_row(row: tuple[Any, ...]) -> database.Signature | None:
+    uuid, key_hash, description, value, created_at, revision, replica_of = row
+    if uuid is None:
+        return None
+    return database.Signature.construct(
+        uuid=uuid,
+        key_hash=key_hash,
+        description=description,
+        value=value,
+        created_at=datetime.fromisoformat(created_at),
+        revision=revision,
+        replica_of=replica_of,
+    )
+
+
+def _pool_from_row(row: tuple[Any, ...]) -> database.Pool:
+    (address, uuid, type, tag, description, public, created_at) = row[:7]  # noqa
+    (master_key_hash, writer_key_hash, reader_key_hash, encrypted, ephemeral) = row[7:12]
+    revision, last_message_id, message_count, last_message_at, stored_bytes, replica_of = row[12:18]
+    return database.build_document(
+        database.Pool,
+        type=type,
+        uuid=uuid,
+        tag=tag,
+        description=description,
+        public=bool(public),
+        creator_signature=_signature_from_row(row[18:]),
+        created_at=datetime.fromisoformat(created_at),
+        master_key_hash=master_key_hash,
+        writer_key_hash=writer_key_hash,
+        reader_key_hash=reader_key_hash,
+        encrypted=bool(encrypted),
+        ephemeral=bool(ephemeral),
+        replica_of=replica_of,
+        revision=revision,
+        last_message_id=last_message_id,
+        message_count=message_count,
+        last_message_at=datetime.fromisoformat(last_message_at) if last_message_at else None,
+        stored_bytes=stored_bytes,
+        messages=[],  # messages are read on demand, see `read_messages`
+    )
+
+
+def _message_from_row(row: tuple[Any, ...]) -> database.PlaintextMessage | database.EncryptedMessage:
+    type, id, date, plaintext, AES_ciphertext, AES_nonce, AES_tag = row[:7]  # noqa
+    signature = _signature_from_row(row[7:14])
+    if type == MessageType.plaintext:
+        return database.PlaintextMessage.construct(
+            type=MessageType.plaintext,
+            id=id,
+            date=datetime.fromisoformat(date),
+            signature=signature,
+            plaintext=plaintext,
+        )
+    return database.EncryptedMessage.construct(
+        type=MessageType.encrypted,
+        id=id,
+        date=datetime.fromisoformat(date),
+        signature=signature,
+        AES_ciphertext=AES_ciphertext,
+        AES_nonce=AES_nonce,
+        AES_tag=AES_tag,
+    )
+
+
+class SQLiteStorage(Storage):
+    """
+    Embedded storage for small nodes which do not want to run a separate `mongod`.
+    All queries are executed by a single dedicated thread, which serializes access to the connection.
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path or config.SQLITE_PATH
+        self.connection: sqlite3.Connection | None = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+
+    async def _run(self, func: Callable[..., T], *args) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def _connect(self):
+        # parametrized queries are compiled once and kept in the connection statement cache
+        self.connection = sqlite3.connect(self.path, check_same_thread=False, cached_statements=256)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        with self.connection:
+            added = set()
+            for table, column, definition in MIGRATIONS:
+                columns = {row[1] for row in self.connection.execute(f"PRAGMA table_info({table})")}
+                if column not in columns:
+                    self.connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+                    added.add((table, column))
+            if ("pools", "message_count") in added:
+                # count messages written before the counters were introduced
+                self.connection.execute(
+                    "UPDATE pools SET (message_count, last_message_id, last_message_at, stored_bytes) = "
+                    f"(SELECT COUNT(*), COALESCE(MAX(id), 0), MAX(date), COALESCE(SUM({MESSAGE_SIZE}), 0) "
+                    "FROM messages WHERE pool = pools.address)"
+                )
+            if not self.connection.execute("SELECT 1 FROM messages_fts LIMIT 1").fetchone():
+                # index messages written before the search was introduced
+                self.connection.execute(
+                    "INSERT INTO messages_fts (pool, plaintext, id) "
+                    "SELECT pool, plaintext, id FROM messages WHERE plaintext IS NOT NULL"
+                )
+
+    async def connect(self):
+        await self._run(self._connect)
+
+    async def close(self):
+        await self._run(self.connection.close)
+        self.executor.shutdown()
+
+    def _fetchone(self, query: str, params: tuple[Any, ...] = ()) -> tuple[Any, ...] | None:
+        return self.connection.execute(query, params).fetchone()
+
+    def _fetchall(self, query: str, params: tuple[Any, ...] = ()) -> list[tuple[Any, ...]]:
+        return self.connection.execute(query, params).fetchall()
+
+    def _execute(self, query: str, params: tuple[Any, ...] = ()):
+        with self.connection:
+            self.connection.execute(query, params)
+
+    # pools
+    async def get_pool(
+        self, identifier: str, allow_stale: bool = False, with_messages: bool = True
+    ) -> database.Pool | None:
+        row = await self._run(
+            self._fetchone,
+            f"{SELECT_POOL} WHERE p.address = ? OR p.tag = ? ORDER BY p.address = ? DESC LIMIT 1",
+            (identifier, identifier, identifier),
+        )
+        return _pool_from_row(row) if row else None
+
+    async def get_public_pools(self, allow_stale: bool = False) -> list[database.Pool]:
+        rows = await self._run(self._fetchall, f"{SELECT_POOL} WHERE p.public = 1 ORDER BY p.created_at")
+        return [_pool_from_row(row) for row in rows]
+
+    async def get_pool_totals(self, allow_stale: bool = False) -> PoolTotals:
+        row = await self._run(
+            self._fetchone,
+            "SELECT COUNT(*), COALESCE(SUM(message_count), 0), COALESCE(SUM(stored_bytes), 0) FROM pools",
+        )
+        return PoolTotals(*row)
+
+    async def create_pool(self, pool: database.Pool):
+        await self._run(
+            self._execute,
+            "INSERT INTO pools (address, uuid, type, tag, description, public, creator_signature, created_at, "
+            "master_key_hash, writer_key_hash, reader_key_hash, encrypted, ephemeral, replica_of) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                pool.address,
+                str(pool.uuid),
+                pool.type.value,
+                pool.tag,
+                pool.description,
+                pool.public,
+                pool.creator_signature.uuid if pool.creator_signature else None,
+                pool.created_at.isoformat(),
+                pool.master_key_hash,
+                pool.writer_key_hash,
+                pool.reader_key_hash,
+                pool.encrypted,
+                pool.ephemeral,
+                pool.replica_of,
+            ),
+        )
+
+    def _update_revisioned(
+        self, table: str, key_column: str, key: str, revision: int, fields: dict[str, Any]
+    ) -> bool:
+        assignments = "".join(f"{column} = ?, " for column in fields)
+        with self.connection:
+            cursor = self.connection.execute(
+                f"UPDATE {table} SET {assignments}revision = revision + 1 "
+                f"WHERE {key_column} = ? AND revision = ?",
+                (*fields.values(), key, revision),
+            )
+        return cursor.rowcount == 1
+
+    async def update_pool(self, pool: database.Pool, fields: dict[str, Any]) -> bool:
+        assert fields.keys() <= POOL_MUTABLE_COLUMNS
+        return await self._run(
+            self._update_revisioned, "pools", "address", pool.address, pool.revision, fields
+        )
+
+    def _delete_pool(self, address: str):
+        with self.connection:
+            self.connection.execute("DELETE FROM pools WHERE address = ?", (address,))
+            self.connection.execute(
+                "DELETE FROM messages_fts WHERE rowid IN "
+                "(SELECT rowid FROM messages_fts WHERE messages_fts MATCH ?)",
+                (f'pool : "{address}"',),
+            )
+
+    async def delete_pool(self, pool: database.Pool):
+        await self._run(self._delete_pool, pool.address)
+
+    # messages
+    def _read_messages(
+        self,
+        address: str,
+        first: int | None,
+        last: int | None,
+        after_id: int,
+        since: datetime | None,
+        until: datetime | None,
+    ) -> tuple[int, list[tuple[Any, ...]]]:
+        row = self._fetchone("SELECT message_count FROM pools WHERE address = ?", (address,))
+        total = row[0] if row else 0
+        query, params = f"{SELECT_MESSAGES} AND m.id > ?", [address, after_id]
+        # dates are stored in ISO format, so they are ordered as strings (range scan of `messages_date`)
+        if since:
+            query += " AND m.date >= ?"
+            params.append(since.isoformat())
+        if until:
+            query += " AND m.date < ?"
+            params.append(until.isoformat())
+        order = "m.date, m.id" if since or until else "m.id"
+        if first:
+            rows = self._fetchall(f"{query} ORDER BY {order} LIMIT ?", (*params, first))
+        else:
+            descending_order = order.replace(",", " DESC,") + " DESC"
+            rows = self._fetchall(f"{query} ORDER BY {descending_order} LIMIT ?", (*params, last))[::-1]
+        return total, rows
+
+    async def read_messages(
+        self,
+        pool: database.Pool,
+        first: int | None = None,
+        last: int | None = None,
+        after_id: int | None = None,
+        allow_stale: bool = False,
+        since: datetime | None = None,
+        until: datetime | None = None,
+    ) -> tuple[int, list[database.PlaintextMessage | database.EncryptedMessage]]:
+        if not first and not last:
+            raise ValueError()
+        total, rows = await self._run(
+            self._read_messages, pool.address, first, last, after_id or 0, since, until
+        )
+        return total, [_message_from_row(row) for row in rows]
+
+    def _write_messages(
+        self, address: str, messages: list[NewMessage], after_id: int | None
+    ) -> tuple[list[Any], tuple[Any, ...]]:
+        with self.connection:
+            last_id = self.connection.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM messages WHERE pool = ?", (address,)
+            ).fetchone()[0]
+            if after_id is not None:
+                last_id = after_id  # checked by the update of the pool row
+            db_messages = [
+                build_message(
+                    message.type, last_id + i, message.date, message.signature, message.message
+                )
+                for i, message in enumerate(messages, start=1)
+            ]
+            # the pool row is updated first: it stays locked until commit, so it can not be deleted meanwhile;
+            # dates are stored in ISO format, so the latest one is the greatest string
+            updated = self.connection.execute(
+                "UPDATE pools SET message_count = message_count + ?, last_message_id = ?, "
+                "last_message_at = MAX(COALESCE(last_message_at, ''), ?), stored_bytes = stored_bytes + ? "
+                "WHERE address = ? AND last_message_id = COALESCE(?, last_message_id)",
+                (
+                    len(db_messages),
+                    db_messages[-1].id,
+                    max(db_message.date for db_message in db_messages).isoformat(),
+                    sum(map(database.message_size, db_messages)),
+                    address,
+                    after_id,
+                ),
+            )
+            if not updated.rowcount:
+                if after_id is not None and self._pool_exists(address):
+                    raise exceptions.MessageIdConflictException()
+                raise exceptions.PoolDoesNotExistException()
+            self.connection.executemany(
+                "INSERT INTO messages (pool, id, type, date, signature, plaintext, AES_ciphertext, AES_nonce, "
+                "AES_tag) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        address,
+                        db_message.id,
+                        db_message.type.value,
+                        db_message.date.isoformat(),
+                        db_message.signature.uuid if db_message.signature else None,
+                        getattr(db_message, "plaintext", None),
+                        getattr(db_message, "AES_ciphertext", None),
+                        getattr(db_message, "AES_nonce", None),
+                        getattr(db_message, "AES_tag", None),
+                    )
+                    for db_message in db_messages
+                ],
+            )
+            self.connection.executemany(
+                "INSERT INTO messages_fts (pool, plaintext, id) VALUES (?, ?, ?)",
+                [
+                    (address, db_message.plaintext, db_message.id)
+                    for db_message in db_messages
+                    if db_message.type == MessageType.plaintext
+                ],
+            )
+            counters = self.connection.execute(
+                "SELECT message_count, last_message_at, stored_bytes FROM pools WHERE address = ?",
+                (address,),
+            ).fetchone()
+        return db_messages, counters
+
+    def _pool_exists(self, address: str) -> bool:
+        return (
+            self.connection.execute("SELECT 1 FROM pools WHERE address = ?", (address,)).fetchone()
+            is not None
+        )
+
+    async def write_messages(
+        self, pool: database.Pool, messages: list[NewMessage], after_id: int | None = None
+    ) -> list[database.PlaintextMessage | database.EncryptedMessage]:
+        db_messages, (message_count, last_message_at, stored_bytes) = await self._run(
+            self._write_messages, pool.address, messages, after_id
+        )
+        pool.last_message_id = db_messages[-1].id
+        pool.message_count = message_count
+        pool.last_message_at = datetime.fromisoformat(last_message_at)
+        pool.stored_bytes = stored_bytes
+        return db_messages
+
+    async def iter_messages(
+        self, pool: database.Pool, after_id: int = 0, batch_size: int = 500
+    ) -> AsyncIterator[list[database.PlaintextMessage | database.EncryptedMessage]]:
+        while True:
+            rows = await self._run(
+                self._fetchall,
+                f"{SELECT_MESSAGES} AND m.id > ? ORDER BY m.id LIMIT ?",
+                (pool.address, after_id, batch_size),
+            )
+            if not rows:
+                return
+            messages = [_message_from_row(row) for row in rows]
+            yield messages
+            if len(rows) < batch_size:
+                return
+            after_id = messages[-1].id
+
+    async def search_messages(
+        self,
+        pool: database.Pool,
+        terms: list[str],
+        limit: int,
+        before_id: int | None = None,
+        allow_stale: bool = False,
+    ) -> list[database.PlaintextMessage]:
+        phrases = " ".join('"{}"'.format(term.replace('"', '""')) for term in terms)
+        rows = await self._run(
+            self._fetchall,
+            f"{SELECT_MESSAGES} AND m.id IN (SELECT id FROM messages_fts WHERE messages_fts MATCH ? AND id < ?) "
+            "ORDER BY m.id DESC LIMIT ?",
+            (
+                pool.address,
+                f'pool : "{pool.address}" AND plaintext : ({phrases})',
+                before_id or 2**63 - 1,
+                limit,
+            ),
+        )
+        return [_message_from_row(row) for row in rows]
+
+    # signatures
+    async def get_signature(self, uuid: str, allow_stale: bool = False) -> database.Signature | None:
+        row = await self._run(
+            self._fetchone, f"SELECT {SIGNATURE_COLUMNS} FROM signatures s WHERE s.uuid = ?", (uuid,)
+        )
+        return _signature_from_row(row) if row else None
+
+    async def get_signature_messages(
+        self,
+        uuid: str,
+        limit: int,
+        before: tuple[datetime, str, int] | None = None,
+        allow_stale: bool = False,
+    ) -> list[SignatureMessage]:
+        # `messages_signature` index entries are ordered by (signature, date, pool, id)
+        query = (
+            f"SELECT p.address, p.tag, {MESSAGE_COLUMNS}, {SIGNATURE_COLUMNS} FROM messages m "
+            "JOIN pools p ON p.address = m.pool LEFT JOIN signatures s ON s.uuid = m.signature "
+            "WHERE m.signature = ? AND p.public = 1"
+        )
+        params = [uuid]
+        if before:
+            query += " AND (m.date, m.pool, m.id) < (?, ?, ?)"
+            params += [before[0].isoformat(), before[1], before[2]]
+        rows = await self._run(
+            self._fetchall,
+            f"{query} ORDER BY m.date DESC, m.pool DESC, m.id DESC LIMIT ?",
+            (*params, limit),
+        )
+        return [SignatureMessage(row[0], row[1], _message_from_row(row[2:])) for row in rows]
+
+    async def count_signatures(self, allow_stale: bool = False) -> int:
+        return (await self._run(self._fetchone, "SELECT COUNT(*) FROM signatures"))[0]
+
+    async def create_signature(self, signature: database.Signature):
+        await self._run(
+            self._execute,
+            "INSERT INTO signatures (uuid, key_hash, description, value, created_at, replica_of) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                signature.uuid,
+                signature.key_hash,
+                signature.description,
+                signature.value,
+                signature.created_at.isoformat(),
+                signature.replica_of,
+            ),
+        )
+
+    async def update_signature(self, signature: database.Signature, fields: dict[str, Any]) -> bool:
+        assert fields.keys() <= SIGNATURE_MUTABLE_COLUMNS
+        return await self._run(
+            self._update_revisioned, "signatures", "uuid", signature.uuid, signature.revision, fields
+        )
+
+    # idempotency keys
+    def _reserve_idempotency_key(
+        self, key: str, route: str, pool: str, fingerprint: str, expires_at: datetime
+    ) -> IdempotencyRecord | None:
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM idempotency_keys WHERE expires_at < ?", (datetime.utcnow().isoformat(),)
+            )
+            row = self.connection.execute(
+                "SELECT fingerprint, response FROM idempotency_keys WHERE key = ? AND route = ? AND pool = ?",
+                (key, route, pool),
+            ).fetchone()
+            if row:
+                return IdempotencyRecord(*row)
+            self.connection.execute(
+                "INSERT INTO idempotency_keys (key, route, pool, fingerprint, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (key, route, pool, fingerprint, expires_at.isoformat()),
+            )
+        return None
+
+    async def reserve_idempotency_key(
+        self, key: str, route: str, pool: str, fingerprint: str, expires_at: datetime
+    ) -> IdempotencyRecord | None:
+        return await self._run(self._reserve_idempotency_key, key, route, pool, fingerprint, expires_at)
+
+    async def complete_idempotency_key(
+        self, key: str, route: str, pool: str, response: bytes, expires_at: datetime
+    ):
+        await self._run(
+            self._execute,
+            "UPDATE idempotency_keys SET response = ?, expires_at = ? WHERE key = ? AND route = ? AND pool = ?",
+            (response, expires_at.isoformat(), key, route, pool),
+        )
+
+    async def release_idempotency_key(self, key: str, route: str, pool: str):
+        await self._run(
+            self._execute,
+            "DELETE FROM idempotency_keys WHERE key = ? AND route = ? AND pool = ?",
+            (key, route, pool),
+        )
@@ -1,12 +1,14 @@
+from datetime import datetime
 from typing import Any, NoReturn, Type
 
 from node import auth, exceptions, models
-
+from node.enums import MessageType
 from node.exceptions import APIException
+from node.storage import storage
 
 
 def generate_responses(
-    success_description: str, api_exceptions: list[Type[APIException]]
+    success_description: str, api_exceptions: list[Type[APIException]], conditional: bool = False
 ) -> dict[int, dict[str, Any]]:
     responses = {
         200: {"description": f"**Successful response:**\n\n{success_description}"},
@@ -15,6 +17,10 @@ def generate_responses(
             "model": models.response.ResponseError,
         },
     }
+    if conditional:
+        responses[304] = {
+            "description": "**Not modified** (`If-None-Match` matches `ETag` of the response)."
+        }
     for exception in api_exceptions:
         responses[exception.status_code] = {
             "description": f"**{exception.error_message}**",
@@ -26,9 +32,7 @@ def generate_responses(
 async def get_verified_signature(
     signature: models.request.RequestSignature,
 ) -> models.database.Signature | NoReturn:
-    db_signature = await models.database.Signature.find_one(
-        models.database.Signature.uuid == signature.uuid
-    )
+    db_signature = await storage.get_signature(signature.uuid)
     if not db_signature:
         raise exceptions.SignatureNotFoundException()
     if not auth.verify_key(signature.key, db_signature.key_hash):
@@ -36,5 +40,31 @@ async def get_verified_signature(
     return db_signature
 
 
+def verify_reader_key(pool: models.database.Pool, reader_key: str | None) -> NoReturn | None:
+    if pool.reader_key_hash:
+        if reader_key:
+            if not auth.verify_key(reader_key, pool.reader_key_hash):
+                raise exceptions.InvalidReaderKeyException()
+        else:
+            raise exceptions.AccessDeniedException("Reader key is required to read this pool.")
+
+
 def build_errors_message(prefix: str, errors: list[str]):
     return f"{prefix}: {', '.join(errors)}."
+
+
+def to_local_naive(date: datetime | None) -> datetime | None:
+    """Converts timezone-aware date to the naive local one, as message dates are stored."""
+    return date.astimezone().replace(tzinfo=None) if date and date.tzinfo else date
+
+
+def build_response_message(
+    db_message,
+) -> models.response.ResponsePlaintextMessage | models.response.ResponseEncryptedMessage:
+    match db_message.type:
+        case MessageType.plaintext:
+            return models.response.ResponsePlaintextMessage.from_db_model(db_message)
+        case MessageType.encrypted:
+            return models.response.ResponseEncryptedMessage.from_db_model(db_message)
+        case _:
+            raise ValueError("Invalid message type.")
@@ -0,0 +1,103 @@
+import os
+
+# the config is read on import of `node.config`, required variables get test values
+os.environ.setdefault("NODE_NAME", "test")
+os.environ.setdefault("NODE_DESCRIPTION", "test node")
+# route tests run the app on SQLite, storage tests open their backends explicitly
+os.environ["STORAGE_BACKEND"] = "sqlite"
+
+from concurrent.futures import ThreadPoolExecutor  # noqa: E402
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+from pymongo.errors import PyMongoError  # noqa: E402
+
+from node.config import config  # noqa: E402
+from node.storage.base import Storage  # noqa: E402
+
+MONGO_TEST_DB = "evade84-node-test"
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+async def open_sqlite(tmp_path) -> Storage:
+    from node.storage.sqlite import SQLiteStorage
+
+    storage = SQLiteStorage(str(tmp_path / "node.sqlite3"))
+    await storage.connect()
+    return storage
+
+
+async def open_mongo(monkeypatch) -> Storage:
+    from node.storage.mongo import MongoStorage, build_client
+
+    monkeypatch.setattr(config, "MONGO_DB", MONGO_TEST_DB)
+    monkeypatch.setattr(config, "MONGO_SERVER_SELECTION_TIMEOUT_MS", 1000)
+    storage = MongoStorage()
+    try:
+        # leftovers of an interrupted run
+        await build_client().drop_database(MONGO_TEST_DB)
+        await storage.connect()
+    except PyMongoError as exc:
+        pytest.skip(f"MongoDB is not available: {exc}")
+    return storage
+
+
+@pytest.fixture(params=["sqlite", "mongo"])
+async def storage(request, tmp_path, monkeypatch):
+    if request.param == "sqlite":
+        storage = await open_sqlite(tmp_path)
+    else:
+        storage = await open_mongo(monkeypatch)
+    yield storage
+    if request.param == "mongo":
+        await storage.client.drop_database(MONGO_TEST_DB)
+    await storage.close()
+
+
+@pytest.fixture
+async def client(tmp_path, monkeypatch) -> httpx.AsyncClient:
+    """Client of the app running in this process on a fresh SQLite database."""
+    from node import main
+    from node.storage import storage
+
+    monkeypatch.setattr(storage, "path", str(tmp_path / "app.sqlite3"))
+    monkeypatch.setattr(storage, "executor", ThreadPoolExecutor(max_workers=1))
+    # routers are included on startup, the routes of the previous test are dropped
+    monkeypatch.setattr(main.app.router, "routes", list(main.app.router.routes))
+    await main.on_startup()
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=main.app), base_url="http://node"
+    ) as client:
+        yield client
+    await main.on_shutdown()
+
+
+async def create_signature(client: httpx.AsyncClient, value: str = "alice") -> dict:
+    result = await client.post("/signature/create", json={"value": value, "key": "signature-key"})
+    assert result.status_code == 200, result.text
+    return result.json()
+
+
+async def create_pool(client: httpx.AsyncClient, **fields) -> dict:
+    """Creates a public wall (anybody can write to it and read it) with the master key `master-key`."""
+    result = await client.post(
+        "/pool/create",
+        params={"pool_type": "wall"},
+        json={"public": True, "master_key": "master-key", **fields},
+    )
+    assert result.status_code == 200, result.text
+    return result.json()
+
+
+async def write(client: httpx.AsyncClient, identifier: str, text: str, **fields) -> dict:
+    result = await client.post(
+        f"/pool/{identifier}/write",
+        params={"message_type": "plaintext"},
+        json={"plaintext": text, **fields},
+    )
+    assert result.status_code == 200, result.text
+    return result.json()
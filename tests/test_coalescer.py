@@ -0,0 +1,96 @@
+"""Group commit of messages written to the same pool (`node.coalescer`) on the SQLite backend."""
+import asyncio
+import json
+
+import pytest
+
+from node import coalescer, directory
+from node.config import config
+from node.directory import Directory
+from node.exceptions import PoolDoesNotExistException
+from node.storage.base import Storage
+from tests.conftest import open_sqlite
+from tests.test_storage import create_pool, new_messages
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def storage(tmp_path, monkeypatch):
+    """SQLite storage used by the coalescer, sizes of the written batches are recorded in `batches`."""
+    storage = await open_sqlite(tmp_path)
+    storage.batches = []
+    write_messages = storage.write_messages
+
+    async def recording_write_messages(pool, messages, after_id=None):
+        storage.batches.append(len(messages))
+        return await write_messages(pool, messages, after_id)
+
+    monkeypatch.setattr(storage, "write_messages", recording_write_messages)
+    monkeypatch.setattr(coalescer, "storage", storage)
+    monkeypatch.setattr(coalescer, "directory", Directory())
+    monkeypatch.setattr(directory, "storage", storage)
+    monkeypatch.setattr(config, "WRITE_BATCH_SIZE", 100)
+    monkeypatch.setattr(config, "WRITE_BATCH_WINDOW_MS", 20)
+    yield storage
+    await storage.close()
+
+
+async def write_concurrently(pool, texts: list[str]) -> list:
+    writer = coalescer.WriteCoalescer()
+    return await asyncio.gather(
+        *[writer.write(pool, message) for message in new_messages(texts)], return_exceptions=True
+    )
+
+
+async def test_concurrent_writes_are_one_batch(storage: Storage):
+    pool = await create_pool(storage)
+    texts = [f"message {index}" for index in range(10)]
+    written = await write_concurrently(pool, texts)
+
+    assert storage.batches == [10]
+    assert [message.id for message in written] == list(range(1, 11))
+    assert [message.plaintext for message in written] == texts
+    _, messages = await storage.read_messages(pool, first=20)
+    assert [message.plaintext for message in messages] == texts
+
+
+async def test_batches_are_split_by_size(storage: Storage, monkeypatch):
+    monkeypatch.setattr(config, "WRITE_BATCH_SIZE", 4)
+    pool = await create_pool(storage)
+    written = await write_concurrently(pool, [f"message {index}" for index in range(10)])
+
+    assert storage.batches == [4, 4, 2]
+    assert [message.id for message in written] == list(range(1, 11))
+
+
+async def test_writes_during_flush_go_to_next_batch(storage: Storage, monkeypatch):
+    monkeypatch.setattr(config, "WRITE_BATCH_WINDOW_MS", 0)
+    pool = await create_pool(storage)
+    writer = coalescer.WriteCoalescer()
+    first = asyncio.create_task(writer.write(pool, new_messages(["first"])[0]))
+    await asyncio.sleep(0)  # the flush has started
+    rest = [writer.write(pool, message) for message in new_messages(["second", "third"])]
+    written = await asyncio.gather(first, *rest)
+
+    assert storage.batches == [1, 2]
+    assert [message.id for message in written] == [1, 2, 3]
+
+
+async def test_failed_batch_fails_every_write(storage: Storage):
+    pool = await create_pool(storage)
+    await storage.delete_pool(pool)
+    results = await write_concurrently(pool, ["first", "second", "third"])
+
+    assert storage.batches == [3]
+    assert all(isinstance(result, PoolDoesNotExistException) for result in results)
+
+
+async def test_directory_gets_counters_of_written_batches(storage: Storage):
+    pool = await create_pool(storage)
+    await coalescer.directory.rebuild()
+    await write_concurrently(pool, ["a", "bb", "ccc"])
+
+    body, _ = await coalescer.directory.get_page(10, 0)
+    listed = json.loads(body)["pools"][0]
+    assert (listed["message_count"], listed["last_message_id"], listed["stored_bytes"]) == (3, 3, 6)
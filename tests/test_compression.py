@@ -0,0 +1,162 @@
+"""Negotiated response compression of `node.compression.CompressionMiddleware`."""
+import json
+import zlib
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+
+from node import etag
+from node.compression import CompressionMiddleware, brotli, negotiate, zstandard
+from node.config import config
+from tests.conftest import create_pool, write
+
+pytestmark = pytest.mark.anyio
+
+# br and zstd are tested if the `compression` extra is installed
+ENCODINGS = [
+    "gzip",
+    pytest.param("br", marks=pytest.mark.skipif(brotli is None, reason="brotli is not installed")),
+    pytest.param(
+        "zstd", marks=pytest.mark.skipif(zstandard is None, reason="zstandard is not installed")
+    ),
+]
+LARGE = json.dumps([{"id": index, "plaintext": f"message {index}"} for index in range(200)]).encode()
+SMALL = b'{"id": 1}'
+
+
+async def page(request: Request) -> Response:
+    body = LARGE if request.query_params.get("size") != "small" else SMALL
+    tag = etag.build_from_body(body)
+    if etag.matches(request.headers.get("if-none-match"), tag):
+        return etag.not_modified(tag)
+    return Response(body, media_type="application/json", headers={"ETag": tag})
+
+
+async def export(_: Request) -> StreamingResponse:
+    async def lines():
+        for index in range(100):
+            yield b'{"id": %d, "plaintext": "streamed message"}\n' % index
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+async def image(_: Request) -> Response:
+    return Response(LARGE, media_type="image/png")
+
+
+@pytest.fixture
+async def compressed(monkeypatch):
+    monkeypatch.setattr(config, "COMPRESSION_ENCODINGS", "zstd,br,gzip")
+    monkeypatch.setattr(config, "COMPRESSION_MIN_SIZE", 1024)
+    monkeypatch.setattr(config, "COMPRESSION_THREAD_MIN_SIZE", 4096)  # large page goes to a thread
+    app = CompressionMiddleware(
+        Starlette(routes=[Route("/page", page), Route("/export", export), Route("/image", image)])
+    )
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://node"
+    ) as client:
+        yield client
+
+
+def decompress(encoding: str, body: bytes) -> bytes:
+    match encoding:
+        case "gzip":
+            return zlib.decompress(body, 31)
+        case "br":
+            return brotli.decompress(body)
+        case "zstd":
+            return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+
+
+async def get_raw(client: httpx.AsyncClient, path: str, **headers) -> tuple[httpx.Response, bytes]:
+    """Returns the response and its body as sent, without decoding."""
+    headers = {name.replace("_", "-"): value for name, value in headers.items()}
+    async with client.stream("GET", path, headers=headers) as response:
+        return response, b"".join([chunk async for chunk in response.aiter_raw()])
+
+
+def test_negotiate():
+    encodings = ["zstd", "br", "gzip"]
+    assert negotiate("gzip, br, zstd", encodings) == "zstd"
+    assert negotiate("gzip;q=1.0, br;q=0.5", encodings) == "gzip"
+    assert negotiate("zstd;q=0, *;q=0.1", encodings) == "br"
+    assert negotiate("identity", encodings) is None
+    assert negotiate(None, encodings) is None
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+async def test_large_page_is_compressed(compressed, encoding):
+    response, body = await get_raw(compressed, "/page", accept_encoding=encoding)
+    assert response.headers["content-encoding"] == encoding
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) == len(body) < len(LARGE)
+    assert decompress(encoding, body) == LARGE
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+async def test_stream_is_compressed_by_chunks(compressed, encoding):
+    response, body = await get_raw(compressed, "/export", accept_encoding=encoding)
+    assert response.headers["content-encoding"] == encoding
+    assert "content-length" not in response.headers
+    lines = decompress(encoding, body).splitlines()
+    assert len(lines) == 100 and json.loads(lines[-1])["id"] == 99
+
+
+async def test_small_and_binary_bodies_are_sent_as_is(compressed):
+    response, body = await get_raw(compressed, "/page?size=small", accept_encoding="gzip")
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert body == SMALL
+
+    response, body = await get_raw(compressed, "/image", accept_encoding="gzip")
+    assert "content-encoding" not in response.headers
+    assert body == LARGE
+
+
+async def test_no_accepted_encoding(compressed):
+    response, body = await get_raw(compressed, "/page", accept_encoding="identity")
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == etag.build_from_body(LARGE)
+    assert body == LARGE
+
+
+@pytest.mark.parametrize("size", ["large", "small"])
+async def test_not_modified_has_the_tag_of_the_page(compressed, size):
+    """The validator of a 304 is the same as of the 200, whether its body was compressed or not."""
+    page_response, _ = await get_raw(compressed, f"/page?size={size}", accept_encoding="gzip")
+    tag = page_response.headers["etag"]
+    assert tag.startswith("W/")
+
+    response, body = await get_raw(
+        compressed, f"/page?size={size}", accept_encoding="gzip", if_none_match=tag
+    )
+    assert response.status_code == 304 and body == b""
+    assert response.headers["etag"] == tag
+    assert "content-encoding" not in response.headers
+
+
+async def test_compressed_pages_are_cached_per_version(compressed):
+    first, first_body = await get_raw(compressed, "/page", accept_encoding="gzip")
+    second, second_body = await get_raw(compressed, "/page", accept_encoding="gzip")
+    assert first_body == second_body
+    assert first.headers["etag"] == second.headers["etag"]
+
+
+async def test_pool_read_tags(client):
+    """Reproduction on the app: a small uncompressed page and its 304 share the validator."""
+    pool = await create_pool(client)
+    await write(client, pool["address"], "short")
+
+    page = await client.get(f"/pool/{pool['address']}/read", params={"first": 10})
+    assert "content-encoding" not in page.headers
+    not_modified = await client.get(
+        f"/pool/{pool['address']}/read",
+        params={"first": 10},
+        headers={"If-None-Match": page.headers["etag"]},
+    )
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == page.headers["etag"]
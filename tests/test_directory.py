@@ -0,0 +1,82 @@
+"""Snapshot of public pools served by `/pool/list` (`node.directory`)."""
+import pytest
+
+from node.config import config
+from node.directory import directory
+from node.storage import storage
+from tests.conftest import create_pool, write
+from tests.test_storage import build_pool
+
+pytestmark = pytest.mark.anyio
+
+
+async def list_pools(client, **params) -> dict:
+    result = await client.get("/pool/list", params={"limit": 10, "offset": 0, **params})
+    assert result.status_code == 200, result.text
+    return result.json()
+
+
+def addresses(page: dict) -> list[str]:
+    return [pool["address"] for pool in page["pools"]]
+
+
+async def test_rebuild_lists_public_pools_only(client):
+    first = await create_pool(client)
+    await create_pool(client, public=False)
+    second = await create_pool(client)
+    await directory.rebuild()
+
+    page = await list_pools(client)
+    assert (page["total"], page["count"]) == (2, 2)
+    assert addresses(page) == [first["address"], second["address"]]
+
+
+async def test_list_is_served_from_snapshot(client, monkeypatch):
+    listed = await create_pool(client)
+    # created by another worker: the snapshot does not know about it until the next rebuild
+    pool = build_pool()
+    await storage.create_pool(pool)
+    assert addresses(await list_pools(client)) == [listed["address"]]
+
+    result = await client.get("/pool/list", params={"limit": 10, "offset": 0})
+    assert result.headers["cache-control"] == f"public, max-age={config.DIRECTORY_MAX_AGE_SEC}"
+    not_modified = await client.get(
+        "/pool/list",
+        params={"limit": 10, "offset": 0},
+        headers={"If-None-Match": result.headers["etag"]},
+    )
+    assert not_modified.status_code == 304
+
+    monkeypatch.setattr(config, "DIRECTORY_REFRESH_SEC", 0)
+    assert set(addresses(await list_pools(client))) == {listed["address"], pool.address}
+
+
+async def test_counters_follow_writes_and_deletes(client):
+    quiet, busy, latest = [await create_pool(client) for _ in range(3)]
+    for text in ["a", "bb", "ccc"]:
+        await write(client, busy["address"], text)
+    await write(client, latest["address"], "dddd")
+
+    page = await list_pools(client)
+    listed = {pool["address"]: pool for pool in page["pools"]}
+    assert (listed[busy["address"]]["message_count"], listed[busy["address"]]["stored_bytes"]) == (3, 6)
+    assert listed[latest["address"]]["last_message_id"] == 1
+    assert addresses(await list_pools(client, sort="message_count"))[:2] == [
+        busy["address"],
+        latest["address"],
+    ]
+    assert addresses(await list_pools(client, sort="last_message_at"))[:2] == [
+        latest["address"],
+        busy["address"],
+    ]
+
+    # the incrementally updated snapshot is the same as a rebuilt one
+    incremental = await list_pools(client)
+    await directory.rebuild()
+    assert await list_pools(client) == incremental
+
+    result = await client.delete(f"/pool/{busy['address']}/delete", params={"master_key": "master-key"})
+    assert result.status_code == 200
+    page = await list_pools(client, sort="message_count")
+    assert page["total"] == 2
+    assert addresses(page) == [latest["address"], quiet["address"]]
@@ -0,0 +1,103 @@
+"""Ring buffer of ephemeral pools and ephemeral pools served by the app."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from node.config import config
+from node.enums import MessageType
+from node.ephemeral import EphemeralMessage, RingBuffer
+from tests.conftest import create_pool, write
+
+START = datetime(2022, 6, 1, 12, 0)
+
+
+def fill(buffer: RingBuffer, count: int) -> RingBuffer:
+    for id in range(buffer.last_id + 1, buffer.last_id + count + 1):
+        buffer.append(
+            EphemeralMessage(
+                MessageType.plaintext, id, START + timedelta(minutes=id), None, plaintext=f"m{id}"
+            )
+        )
+    return buffer
+
+
+def ids(messages: list[EphemeralMessage]) -> list[int]:
+    return [message.id for message in messages]
+
+
+def test_capacity_must_be_positive():
+    with pytest.raises(ValueError):
+        RingBuffer(0)
+
+
+def test_empty_buffer():
+    buffer = RingBuffer(3)
+    assert len(buffer) == 0
+    assert (buffer.last_id, buffer.last_date, buffer.stored_bytes) == (0, None, 0)
+    assert buffer.first(10) == buffer.last(10) == []
+
+
+def test_append_below_capacity():
+    buffer = fill(RingBuffer(5), 3)
+    assert len(buffer) == 3
+    assert (buffer.last_id, buffer.last_date, buffer.stored_bytes) == (
+        3,
+        START + timedelta(minutes=3),
+        6,
+    )
+    assert ids(buffer.first(10)) == ids(buffer.last(10)) == [1, 2, 3]
+
+
+def test_wraparound_evicts_oldest():
+    buffer = fill(RingBuffer(3), 8)
+    assert len(buffer) == 3
+    assert ids(buffer.first(10)) == [6, 7, 8]
+    assert [message.plaintext for message in buffer.last(10)] == ["m6", "m7", "m8"]
+    # only the kept messages are counted
+    assert buffer.stored_bytes == 6
+    fill(buffer, 3)  # ids of two digits
+    assert ids(buffer.first(10)) == [9, 10, 11]
+    assert buffer.stored_bytes == 2 + 3 + 3
+
+
+def test_first_pagination():
+    buffer = fill(RingBuffer(5), 7)
+    assert ids(buffer.first(2)) == [3, 4]
+    assert ids(buffer.first(2, after_id=4)) == [5, 6]
+    assert ids(buffer.first(10, after_id=5)) == [6, 7]
+    assert buffer.first(10, after_id=7) == []
+    # evicted messages are skipped
+    assert ids(buffer.first(2, after_id=1)) == [3, 4]
+
+
+def test_last_pagination():
+    buffer = fill(RingBuffer(5), 7)
+    assert ids(buffer.last(2)) == [6, 7]
+    assert ids(buffer.last(10)) == [3, 4, 5, 6, 7]
+    assert ids(buffer.last(10, after_id=5)) == [6, 7]
+    assert buffer.last(2, after_id=7) == []
+
+
+@pytest.mark.anyio
+async def test_ephemeral_pool_messages(client):
+    pool = await create_pool(client, ephemeral=True)
+    for text in ["first", "second", "third"]:
+        await write(client, pool["address"], text)
+
+    result = (await client.get(f"/pool/{pool['address']}/read", params={"last": 2})).json()
+    assert result["total"] == 3 and result["has_more"]
+    assert [message["plaintext"] for message in result["messages"]] == ["second", "third"]
+    info = (await client.get(f"/pool/{pool['address']}")).json()
+    assert (info["ephemeral"], info["message_count"], info["last_message_id"]) == (True, 3, 3)
+
+
+@pytest.mark.anyio
+async def test_ephemeral_pools_require_single_worker(client, monkeypatch):
+    monkeypatch.setattr(config, "FANOUT_MODE", "mongo")
+    result = await client.post(
+        "/pool/create",
+        params={"pool_type": "wall"},
+        json={"master_key": "master-key", "ephemeral": True},
+    )
+    assert result.status_code == 409
+    assert "several workers" in result.json()["error_message"]
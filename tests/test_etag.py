@@ -0,0 +1,95 @@
+"""Conditional requests of pool routes (`ETag` / `If-None-Match`)."""
+import pytest
+
+from node import ephemeral, etag
+from node.storage import storage
+from tests.conftest import create_pool, create_signature, write
+
+pytestmark = pytest.mark.anyio
+
+
+async def get_tag(client, path: str, **params) -> str:
+    result = await client.get(path, params=params)
+    assert result.status_code == 200, result.text
+    return result.headers["etag"]
+
+
+async def test_not_modified_without_reading_messages(client, monkeypatch):
+    pool = await create_pool(client)
+    await write(client, pool["address"], "hello")
+    path = f"/pool/{pool['address']}/read"
+    tag = await get_tag(client, path, first=10)
+
+    reads = []
+    read_messages = storage.read_messages
+
+    async def counting_read_messages(*args, **kwargs):
+        reads.append(args)
+        return await read_messages(*args, **kwargs)
+
+    monkeypatch.setattr(storage, "read_messages", counting_read_messages)
+    result = await client.get(path, params={"first": 10}, headers={"If-None-Match": tag})
+    assert result.status_code == 304 and result.content == b""
+    assert result.headers["etag"] == tag
+    assert reads == []
+
+    result = await client.get(path, params={"first": 10}, headers={"If-None-Match": '"another"'})
+    assert result.status_code == 200 and len(reads) == 1
+
+
+async def test_pool_info_not_modified(client):
+    pool = await create_pool(client)
+    tag = await get_tag(client, f"/pool/{pool['address']}")
+    result = await client.get(f"/pool/{pool['address']}", headers={"If-None-Match": tag})
+    assert result.status_code == 304
+    # the tag of the pool is also the tag of its messages
+    assert tag == await get_tag(client, f"/pool/{pool['address']}/read", last=5)
+
+
+async def test_tag_changes_on_write_and_update(client):
+    pool = await create_pool(client)
+    path = f"/pool/{pool['address']}"
+    tags = [await get_tag(client, path)]
+
+    await write(client, pool["address"], "hello")
+    tags.append(await get_tag(client, path))
+
+    result = await client.post(
+        f"{path}/update", params={"master_key": "master-key"}, json={"new_description": "updated"}
+    )
+    assert result.status_code == 200
+    tags.append(await get_tag(client, path))
+    assert len(set(tags)) == 3
+
+
+async def test_tag_changes_on_creator_signature_update(client):
+    signature = await create_signature(client)
+    pool = await create_pool(
+        client, creator_signature={"uuid": signature["uuid"], "key": "signature-key"}
+    )
+    path = f"/pool/{pool['address']}"
+    tag = await get_tag(client, path)
+
+    result = await client.post(
+        f"/signature/{signature['uuid']}/update",
+        params={"key": "signature-key"},
+        json={"new_value": "bob"},
+    )
+    assert result.status_code == 200
+    assert await get_tag(client, path) != tag
+    assert (await client.get(path)).json()["creator_signature"]["value"] == "bob"
+
+
+async def test_ephemeral_tag_changes_on_restart(client, monkeypatch):
+    pool = await create_pool(client, ephemeral=True)
+    await write(client, pool["address"], "hello")
+    path = f"/pool/{pool['address']}/read"
+    tag = await get_tag(client, path, first=10)
+
+    # a restart loses the messages, the new ones get the same ids
+    monkeypatch.setattr(etag, "EPOCH", "restarted")
+    monkeypatch.setattr(ephemeral, "_buffers", {})
+    await write(client, pool["address"], "another hello")
+    result = await client.get(path, params={"first": 10}, headers={"If-None-Match": tag})
+    assert result.status_code == 200
+    assert result.json()["messages"][0]["plaintext"] == "another hello"
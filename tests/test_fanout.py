@@ -0,0 +1,51 @@
+"""Fan-out over the change stream, requires MongoDB replica set (a single-node one is enough)."""
+import asyncio
+
+import pytest
+
+from node.fanout import FanOut
+from node.models import database
+from tests.conftest import MONGO_TEST_DB, open_mongo
+from tests.test_storage import build_pool, new_messages
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def mongo(monkeypatch):
+    storage = await open_mongo(monkeypatch)
+    hello = await storage.client.admin.command("hello")
+    if not hello.get("setName"):
+        await storage.close()
+        pytest.skip("MongoDB is not a replica set member, change streams are not available.")
+    yield storage
+    await storage.client.drop_database(MONGO_TEST_DB)
+    await storage.close()
+
+
+@pytest.fixture
+async def fanout(mongo):
+    fanout = FanOut()
+    task = asyncio.create_task(fanout._watch(database.Pool.get_motor_collection()))
+    await asyncio.sleep(1)  # the stream only sees events after it is opened
+    yield fanout
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+async def test_message_writes_are_published(mongo, fanout):
+    pool = build_pool()
+    await mongo.create_pool(pool)
+
+    future = fanout.subscribe(pool.address)
+    await mongo.write_messages(pool, new_messages(["first", "second"]))
+    assert await asyncio.wait_for(future, 5) == 2
+
+
+async def test_metadata_updates_are_not_published(mongo, fanout):
+    pool = build_pool()
+    await mongo.create_pool(pool)
+
+    future = fanout.subscribe(pool.address)
+    assert await mongo.update_pool(pool, {"description": "updated"})
+    assert not await fanout.wait(future, pool.address, 1)
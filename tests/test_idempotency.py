@@ -0,0 +1,105 @@
+"""Retries of pool creation and writes with `Idempotency-Key`."""
+import pytest
+
+from node import idempotency
+from node.config import config
+from tests.conftest import create_pool
+
+pytestmark = pytest.mark.anyio
+
+NEW_POOL = {"public": True, "master_key": "master-key", "description": "retried"}
+
+
+async def post_create(client, key: str, **fields):
+    return await client.post(
+        "/pool/create",
+        params={"pool_type": "wall"},
+        json={**NEW_POOL, **fields},
+        headers={"Idempotency-Key": key},
+    )
+
+
+async def post_write(client, identifier: str, key: str, text: str):
+    return await client.post(
+        f"/pool/{identifier}/write",
+        params={"message_type": "plaintext"},
+        json={"plaintext": text},
+        headers={"Idempotency-Key": key},
+    )
+
+
+async def count_pools(client) -> int:
+    return (await client.get("/node")).json()["pools_count"]
+
+
+async def test_create_is_replayed(client):
+    first = await post_create(client, "create-key")
+    retry = await post_create(client, "create-key")
+
+    assert first.status_code == retry.status_code == 200
+    assert "idempotent-replayed" not in first.headers
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert retry.json() == first.json()
+    assert await count_pools(client) == 1
+
+
+async def test_write_is_replayed(client):
+    pool = await create_pool(client, tag="retried")
+    first = await post_write(client, pool["address"], "write-key", "hello")
+    # the same pool written to by its tag
+    retry = await post_write(client, "retried", "write-key", "hello")
+
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert retry.json() == first.json()
+    messages = (await client.get(f"/pool/{pool['address']}/read", params={"first": 10})).json()
+    assert messages["total"] == 1
+
+
+async def test_keys_are_scoped_by_pool(client):
+    first_pool, second_pool = await create_pool(client), await create_pool(client)
+    first = await post_write(client, first_pool["address"], "write-key", "hello")
+    second = await post_write(client, second_pool["address"], "write-key", "hello")
+
+    assert "idempotent-replayed" not in second.headers
+    assert first.json()["id"] == second.json()["id"] == 1
+
+
+async def test_key_reused_with_different_request(client):
+    assert (await post_create(client, "create-key")).status_code == 200
+    result = await post_create(client, "create-key", description="another pool")
+
+    assert result.status_code == 422
+    assert "different request" in result.json()["error_message"]
+    assert await count_pools(client) == 1
+
+
+async def test_expired_key_is_not_replayed(client, monkeypatch):
+    monkeypatch.setattr(config, "IDEMPOTENCY_TTL_SEC", -1)
+    first = await post_create(client, "create-key")
+    retry = await post_create(client, "create-key")
+
+    assert "idempotent-replayed" not in retry.headers
+    assert retry.json()["address"] != first.json()["address"]
+    assert await count_pools(client) == 2
+
+
+async def test_failed_request_may_be_retried(client):
+    result = await post_write(client, "missing-pool", "write-key", "hello")
+    assert result.status_code == 404
+
+    pool = await create_pool(client)
+    await post_create(client, "create-key", tag="taken")
+    assert (await post_create(client, "another-key", tag="taken")).status_code == 409
+    retry = await post_create(client, "another-key", tag="free")
+    assert retry.status_code == 200 and "idempotent-replayed" not in retry.headers
+    assert pool["address"] != retry.json()["address"]
+
+
+def test_several_workers_require_secret(monkeypatch):
+    monkeypatch.setattr(config, "FANOUT_MODE", "mongo")
+    monkeypatch.setattr(config, "IDEMPOTENCY_SECRET", None)
+    with pytest.raises(ValueError):
+        idempotency.check_config()
+
+    monkeypatch.setattr(config, "IDEMPOTENCY_SECRET", "shared-secret")
+    idempotency.check_config()
@@ -0,0 +1,52 @@
+"""Export and import of pool messages as NDJSON."""
+import json
+
+import pytest
+
+from node.config import config
+from tests.conftest import create_pool, write
+
+pytestmark = pytest.mark.anyio
+
+
+async def import_lines(client, identifier: str, body: bytes):
+    return await client.post(
+        f"/pool/{identifier}/import",
+        params={"master_key": "master-key"},
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+
+
+async def test_export_and_import(client):
+    source = await create_pool(client)
+    for text in ["first", "second", "third"]:
+        await write(client, source["address"], text)
+    export = await client.get(f"/pool/{source['address']}/export", params={"after_id": 1})
+    assert [json.loads(line)["plaintext"] for line in export.text.splitlines()] == ["second", "third"]
+
+    target = await create_pool(client)
+    await write(client, target["address"], "existing")
+    result = await import_lines(client, target["address"], export.content)
+    assert result.json() == {"count": 2, "last_message_id": 3}
+    messages = (await client.get(f"/pool/{target['address']}/read", params={"first": 10})).json()
+    assert [message["plaintext"] for message in messages["messages"]] == ["existing", "second", "third"]
+    # dates are kept
+    assert messages["messages"][1]["date"] == json.loads(export.text.splitlines()[0])["date"]
+
+
+async def test_import_rejects_long_lines(client, monkeypatch):
+    monkeypatch.setattr(config, "IMPORT_MAX_LINE_BYTES", 100)
+    pool = await create_pool(client)
+    short = b'{"type": "plaintext", "date": "2022-06-01T12:00:00", "plaintext": "short"}'
+    long = b'{"type": "plaintext", "date": "2022-06-01T12:00:00", "plaintext": "%b"}' % (b"x" * 100)
+
+    # a complete line within one chunk
+    result = await import_lines(client, pool["address"], short + b"\n" + long + b"\n" + short + b"\n")
+    assert result.status_code == 422
+    assert result.json()["error_message"] == "Line 2 is longer than 100 bytes."
+
+    # the last line without a newline
+    result = await import_lines(client, pool["address"], short + b"\n" + long)
+    assert result.status_code == 422
+    assert result.json()["error_message"] == "Line 2 is longer than 100 bytes."
@@ -0,0 +1,41 @@
+"""Sampling of access lines written by `node.middleware.RequestContextMiddleware`."""
+import pytest
+from loguru import logger
+
+from node.config import config
+from node.storage import storage
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def lines(client):
+    lines = []
+    sink = logger.add(
+        lines.append, format="{message}", filter=lambda record: "latency_ms" in record["extra"]
+    )
+    yield lines
+    logger.remove(sink)
+
+
+async def test_access_lines_are_sampled(client, lines, monkeypatch):
+    monkeypatch.setattr(config, "LOG_ACCESS_SAMPLE_RATE", 0)
+    assert (await client.get("/node")).status_code == 200
+    assert (await client.get("/pool/missing-pool")).status_code == 404
+    assert lines == []
+
+    monkeypatch.setattr(config, "LOG_ACCESS_SAMPLE_RATE", 1.0)
+    result = await client.get("/node")
+    assert len(lines) == 1 and lines[0].startswith("GET /node 200 (")
+    assert result.headers["x-request-id"]
+
+
+async def test_server_errors_are_always_logged(client, lines, monkeypatch):
+    monkeypatch.setattr(config, "LOG_ACCESS_SAMPLE_RATE", 0)
+
+    async def failing_get_pool_totals(*args, **kwargs):
+        raise RuntimeError("storage is broken")
+
+    monkeypatch.setattr(storage, "get_pool_totals", failing_get_pool_totals)
+    assert (await client.get("/node")).status_code == 500
+    assert len(lines) == 1 and lines[0].startswith("GET /node 500 (")
@@ -0,0 +1,114 @@
+"""Replication between two nodes: the peer is the app served in-process, the replica has its own database."""
+import asyncio
+
+import httpx
+import pytest
+
+from node import replication
+from node.config import config
+from node.directory import Directory
+from node.fanout import FanOut
+from node.main import app
+from tests.conftest import create_pool, create_signature, open_sqlite, write
+from tests.test_storage import build_signature
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def replica(tmp_path, monkeypatch):
+    """Storage of the replica node, the replicator writes to it instead of the storage of the app."""
+    storage = await open_sqlite(tmp_path)
+    monkeypatch.setattr(replication, "storage", storage)
+    monkeypatch.setattr(replication, "directory", Directory())
+    monkeypatch.setattr(replication, "fanout", FanOut())
+    yield storage
+    await storage.close()
+
+
+@pytest.fixture
+async def start_replicator(client, replica, monkeypatch):
+    monkeypatch.setattr(config, "REPLICATION_PEER", "http://peer")
+    monkeypatch.setattr(config, "REPLICATION_POLL_TIMEOUT_SEC", 1)
+    monkeypatch.setattr(config, "REPLICATION_BATCH_SIZE", 2)
+    replicator = replication.Replicator()
+
+    async def start(*identifiers: str) -> replication.Replicator:
+        monkeypatch.setattr(config, "REPLICATION_POOLS", ",".join(identifiers))
+        await replicator.start(httpx.ASGITransport(app=app))
+        return replicator
+
+    yield start
+    await replicator.stop()
+
+
+async def wait_for_status(replicator: replication.Replicator, check, timeout: float = 10):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        status = replicator.get_status().pools[0]
+        if check(status) or loop.time() > deadline:
+            return status
+        await asyncio.sleep(0.05)
+
+
+async def test_replica_catches_up_and_follows(client, replica, start_replicator):
+    signature = await create_signature(client)
+    pool = await create_pool(client, tag="origin")
+    for index in range(5):  # more than a batch
+        await write(
+            client,
+            "origin",
+            f"message {index}",
+            signature={"uuid": signature["uuid"], "key": "signature-key"},
+        )
+
+    replicator = await start_replicator("origin")
+    status = await wait_for_status(replicator, lambda status: status.lag_sec == 0.0)
+    assert (status.address, status.tag) == (pool["address"], "origin")
+    assert (status.local_last_message_id, status.peer_last_message_id, status.lag_messages) == (5, 5, 0)
+    assert status.error is None
+
+    # the caught up replica long polls the peer and gets new messages as they are written
+    await write(client, "origin", "message 5")
+    status = await wait_for_status(replicator, lambda status: status.local_last_message_id == 6)
+    assert (status.local_last_message_id, status.lag_messages) == (6, 0)
+
+    peer_messages = (await client.get("/pool/origin/read", params={"first": 10})).json()["messages"]
+    replica_pool = await replica.get_pool(pool["address"], with_messages=False)
+    assert replica_pool.replica_of == "http://peer" and replica_pool.tag == "origin"
+    _, messages = await replica.read_messages(replica_pool, first=10)
+    assert [message.id for message in messages] == list(range(1, 7))
+    assert [message.plaintext for message in messages] == [
+        message["plaintext"] for message in peer_messages
+    ]
+    assert [message.date.isoformat() for message in messages] == [
+        message["date"] for message in peer_messages
+    ]
+    assert messages[0].signature.uuid == signature["uuid"]
+    assert messages[0].signature.replica_of == "http://peer"
+    assert messages[-1].signature is None
+
+
+async def test_replica_refuses_colliding_signature(client, replica, start_replicator):
+    signature = await create_signature(client)
+    await create_pool(client, tag="origin")
+    await write(
+        client, "origin", "signed", signature={"uuid": signature["uuid"], "key": "signature-key"}
+    )
+    # a signature of the replica node which happens to have the same uuid
+    await replica.create_signature(build_signature("mallory", uuid=signature["uuid"]))
+
+    replicator = await start_replicator("origin")
+    status = await wait_for_status(replicator, lambda status: status.error is not None)
+    assert "collides" in status.error
+    assert (status.local_last_message_id, status.lag_messages, status.lag_sec) == (0, 1, None)
+    local_signature = await replica.get_signature(signature["uuid"])
+    assert local_signature.value == "mallory"
+
+
+async def test_replica_of_missing_pool_reports_error(client, replica, start_replicator):
+    replicator = await start_replicator("missing-pool")
+    status = await wait_for_status(replicator, lambda status: status.error is not None)
+    assert "404" in status.error
+    assert (status.peer_last_message_id, status.lag_messages, status.lag_sec) == (None, None, None)
@@ -0,0 +1,24 @@
+"""Search of messages: ephemeral pools match words as the text index of the storage does."""
+import pytest
+
+from tests.conftest import create_pool, write
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("ephemeral", [False, True], ids=["persistent", "ephemeral"])
+async def test_search_matches_whole_words(client, ephemeral):
+    pool = await create_pool(client, ephemeral=ephemeral)
+    for text in ["Cat food", "concatenate strings", "the cat and the dog", "dogs only", "CAT, dog!"]:
+        await write(client, pool["address"], text)
+
+    async def search(query: str, **params) -> list[int]:
+        result = await client.get(f"/pool/{pool['address']}/search", params={"query": query, **params})
+        assert result.status_code == 200, result.text
+        return [message["id"] for message in result.json()["messages"]]
+
+    assert await search("cat") == [5, 3, 1]
+    assert await search("cat dog") == [5, 3]
+    assert await search("dog", before_id=5) == [3]
+    assert await search("cat", limit=2) == [5, 3]
+    assert await search("concat") == []
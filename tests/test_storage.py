@@ -0,0 +1,247 @@
+"""Conformance tests of the storage backends, every test runs against SQLite and MongoDB."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from node.enums import MessageType, PoolType
+from node.exceptions import MessageIdConflictException, PoolDoesNotExistException
+from node.models import database, request
+from node.storage.base import NewMessage, Storage
+
+pytestmark = pytest.mark.anyio
+
+START = datetime(2022, 6, 1, 12, 0)
+
+
+def build_pool(tag: str | None = None, public: bool = True) -> database.Pool:
+    return database.build_document(
+        database.Pool,
+        type=PoolType.chat,
+        tag=tag,
+        description="test pool",
+        public=public,
+        creator_signature=None,
+        created_at=START,
+        master_key_hash="master-key-hash",
+        writer_key_hash=None,
+        reader_key_hash=None,
+        encrypted=False,
+        messages=[],
+    )
+
+
+def build_signature(value: str = "alice", **fields) -> database.Signature:
+    return database.build_document(
+        database.Signature,
+        key_hash="key-hash",
+        value=value,
+        description=None,
+        created_at=START,
+        **fields,
+    )
+
+
+def new_messages(
+    texts: list[str], signature: database.Signature | None = None, start: datetime = START
+) -> list[NewMessage]:
+    return [
+        NewMessage(
+            MessageType.plaintext,
+            request.RequestNewMessage(plaintext=text),
+            signature,
+            start + timedelta(minutes=index),
+        )
+        for index, text in enumerate(texts)
+    ]
+
+
+async def create_pool(storage: Storage, *texts: str, **kwargs) -> database.Pool:
+    pool = build_pool(**kwargs)
+    await storage.create_pool(pool)
+    if texts:
+        await storage.write_messages(pool, new_messages(list(texts)))
+    return pool
+
+
+async def test_create_and_get_pool(storage: Storage):
+    pool = await create_pool(storage, tag="test-pool")
+    await create_pool(storage, public=False)
+
+    by_address = await storage.get_pool(pool.address)
+    by_tag = await storage.get_pool("test-pool")
+    assert by_address.address == by_tag.address == pool.address
+    assert by_address.tag == "test-pool"
+    assert by_address.type == PoolType.chat
+    assert by_address.public and not by_address.encrypted
+    assert by_address.created_at == START
+    assert await storage.get_pool("missing-pool") is None
+    assert [public.address for public in await storage.get_public_pools()] == [pool.address]
+
+
+async def test_update_pool_checks_revision(storage: Storage):
+    pool = await create_pool(storage, tag="test-pool")
+    stale = await storage.get_pool(pool.address)
+
+    assert await storage.update_pool(pool, {"description": "updated"})
+    assert not await storage.update_pool(stale, {"description": "lost update"})
+
+    updated = await storage.get_pool(pool.address)
+    assert updated.description == "updated"
+    assert updated.revision == 1
+
+
+async def test_delete_pool(storage: Storage):
+    pool = await create_pool(storage, "first", "second", tag="test-pool")
+    await storage.delete_pool(pool)
+
+    assert await storage.get_pool(pool.address) is None
+    assert await storage.get_pool("test-pool") is None
+    assert await storage.get_public_pools() == []
+
+
+async def test_write_messages_assigns_ids_and_counters(storage: Storage):
+    pool = await create_pool(storage)
+    signature = build_signature()
+    await storage.create_signature(signature)
+
+    first = await storage.write_messages(pool, new_messages(["a", "bb"], signature))
+    second = await storage.write_messages(pool, new_messages(["ccc"], start=START + timedelta(hours=1)))
+
+    assert [message.id for message in first + second] == [1, 2, 3]
+    assert first[0].signature.uuid == signature.uuid
+    assert (pool.message_count, pool.last_message_id, pool.stored_bytes) == (3, 3, 6)
+    assert pool.last_message_at == START + timedelta(hours=1)
+
+    stored = await storage.get_pool(pool.address, with_messages=False)
+    assert (stored.message_count, stored.last_message_id, stored.stored_bytes) == (3, 3, 6)
+    assert stored.last_message_at == START + timedelta(hours=1)
+    assert await storage.get_pool_totals() == (1, 3, 6)
+
+
+async def test_write_messages_to_deleted_pool(storage: Storage):
+    pool = await create_pool(storage, "first")
+    await storage.delete_pool(pool)
+
+    with pytest.raises(PoolDoesNotExistException):
+        await storage.write_messages(pool, new_messages(["orphan"]))
+    assert await storage.get_pool_totals() == (0, 0, 0)
+    assert await storage.search_messages(pool, ["orphan"], limit=10) == []
+
+
+async def test_write_messages_after_id(storage: Storage):
+    pool = await create_pool(storage, "first", "second")
+
+    with pytest.raises(MessageIdConflictException):
+        await storage.write_messages(pool, new_messages(["stale"]), after_id=1)
+    written = await storage.write_messages(pool, new_messages(["third"]), after_id=2)
+
+    assert [message.id for message in written] == [3]
+    total, messages = await storage.read_messages(pool, first=10)
+    assert [message.plaintext for message in messages] == ["first", "second", "third"]
+
+
+async def test_read_messages_pagination(storage: Storage):
+    pool = await create_pool(storage, *[f"message {index}" for index in range(1, 11)])
+
+    total, messages = await storage.read_messages(pool, first=3)
+    assert total == 10
+    assert [message.id for message in messages] == [1, 2, 3]
+    assert messages[0].plaintext == "message 1"
+
+    total, messages = await storage.read_messages(pool, last=2)
+    assert [message.id for message in messages] == [9, 10]
+
+    total, messages = await storage.read_messages(pool, first=3, after_id=4)
+    assert total == 10
+    assert [message.id for message in messages] == [5, 6, 7]
+
+    _, messages = await storage.read_messages(pool, first=5, after_id=10)
+    assert messages == []
+
+
+async def test_read_messages_date_range(storage: Storage):
+    pool = await create_pool(storage, *[f"message {index}" for index in range(1, 11)])
+
+    total, messages = await storage.read_messages(
+        pool, first=10, since=START + timedelta(minutes=2), until=START + timedelta(minutes=5)
+    )
+    assert total == 10
+    assert [message.id for message in messages] == [3, 4, 5]
+
+    _, messages = await storage.read_messages(pool, last=2, until=START + timedelta(minutes=5))
+    assert [message.id for message in messages] == [4, 5]
+
+
+async def test_iter_messages(storage: Storage):
+    pool = await create_pool(storage, *[f"message {index}" for index in range(1, 8)])
+
+    batches = [batch async for batch in storage.iter_messages(pool, after_id=1, batch_size=3)]
+    assert [[message.id for message in batch] for batch in batches] == [[2, 3, 4], [5, 6, 7]]
+
+
+async def test_search_messages(storage: Storage):
+    pool = await create_pool(storage, "red apple", "green apple", "red pepper", "Red Apple pie")
+
+    messages = await storage.search_messages(pool, ["red", "apple"], limit=10)
+    assert [message.id for message in messages] == [4, 1]
+
+    messages = await storage.search_messages(pool, ["red", "apple"], limit=10, before_id=4)
+    assert [message.id for message in messages] == [1]
+    assert await storage.search_messages(pool, ["banana"], limit=10) == []
+
+
+async def test_signatures(storage: Storage):
+    signature = build_signature()
+    await storage.create_signature(signature)
+    stale = await storage.get_signature(signature.uuid)
+
+    assert stale.value == "alice"
+    assert await storage.get_signature("missing") is None
+    assert await storage.count_signatures() == 1
+
+    assert await storage.update_signature(signature, {"description": "updated"})
+    assert not await storage.update_signature(stale, {"description": "lost update"})
+    updated = await storage.get_signature(signature.uuid)
+    assert (updated.description, updated.revision) == ("updated", 1)
+
+
+async def test_signature_messages_pagination(storage: Storage):
+    signature = build_signature()
+    await storage.create_signature(signature)
+    public = await create_pool(storage, tag="public-pool")
+    private = await create_pool(storage, public=False)
+    await storage.write_messages(public, new_messages(["a", "b", "c"], signature))
+    await storage.write_messages(private, new_messages(["hidden"], signature))
+
+    page = await storage.get_signature_messages(signature.uuid, limit=2)
+    assert [(item.pool_address, item.message.id) for item in page] == [
+        (public.address, 3),
+        (public.address, 2),
+    ]
+    assert page[0].pool_tag == "public-pool"
+
+    last = page[-1]
+    page = await storage.get_signature_messages(
+        signature.uuid, limit=2, before=(last.message.date, last.pool_address, last.message.id)
+    )
+    assert [item.message.id for item in page] == [1]
+
+
+async def test_idempotency_keys(storage: Storage):
+    expires_at = datetime.utcnow() + timedelta(minutes=1)
+
+    assert await storage.reserve_idempotency_key("key", "write", "pool", "fp", expires_at) is None
+    assert await storage.reserve_idempotency_key("key", "write", "pool", "fp", expires_at) == (
+        "fp",
+        None,
+    )
+    assert await storage.reserve_idempotency_key("key", "write", "other", "fp", expires_at) is None
+
+    await storage.complete_idempotency_key("key", "write", "pool", b"response", expires_at)
+    assert await storage.reserve_idempotency_key("key", "write", "pool", "fp", expires_at) == (
+        "fp",
+        b"response",
+    )
+
+    await storage.release_idempotency_key("key", "write", "other")
+    assert await storage.reserve_idempotency_key("key", "write", "other", "fp", expires_at) is None